@@ -0,0 +1,105 @@
+import io
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+import jsonconv
+import prority
+import stream_clean
+from columnar import read_records, write_table
+from pipeline import CLEANED_FILE, FINAL_FILE, PRIORITY_FILE, RAW_FILE, ROOT_DIR, STATIONS
+
+STORE_DIR = 'schedule_store.cols'
+
+def find_stations(root_dir=ROOT_DIR):
+    """
+    Finds every station directory: the root and each sub-directory holding a
+    raw scrape or a cleaned CSV. Directories listed in pipeline.STATIONS keep
+    their station code; any other is named after its directory.
+    """
+    names = {os.path.normpath(station["dir"]): station["name"] for station in STATIONS}
+    candidates = ["."] + sorted(entry.name for entry in os.scandir(root_dir)
+                                if entry.is_dir() and not entry.name.startswith(('.', '_')))
+    stations = []
+    for directory in candidates:
+        if any(os.path.exists(os.path.join(root_dir, directory, name)) for name in (RAW_FILE, CLEANED_FILE)):
+            stations.append({"name": names.get(directory, directory.upper()), "dir": directory})
+    return stations
+
+def process_station(station, root_dir=ROOT_DIR):
+    """
+    Runs clean -> prioritise -> JSON for one station directory. Never raises:
+    returns a result dict with the status, timing, record count and the
+    station's own log, so one bad station cannot stop the others.
+    """
+    def path(name):
+        return os.path.join(root_dir, station["dir"], name)
+
+    log = io.StringIO()
+    started = time.perf_counter()
+    result = {"name": station["name"], "dir": station["dir"]}
+    try:
+        with redirect_stdout(log):
+            if os.path.exists(path(RAW_FILE)):
+                stream_clean.clean_scraped_data(path(RAW_FILE), path(CLEANED_FILE))
+            prority.prioritize_data(path(CLEANED_FILE), path(PRIORITY_FILE))
+            jsonconv.convert_csv_to_json(path(PRIORITY_FILE), path(FINAL_FILE))
+        # The stages report missing files by printing, so check for the output
+        if not os.path.exists(path(FINAL_FILE)):
+            raise FileNotFoundError(f"'{path(FINAL_FILE)}' was not written.")
+        result.update(status="ok", records=len(read_records(path(FINAL_FILE))))
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    result.update(seconds=time.perf_counter() - started, log=log.getvalue())
+    return result
+
+def build_store(results, root_dir=ROOT_DIR, store_dir=STORE_DIR):
+    """
+    Merges the final records of every successful station into one columnar
+    table with a Station column. Returns the number of rows written.
+    """
+    frames = []
+    for result in results:
+        if result["status"] == "ok":
+            records = read_records(os.path.join(root_dir, result["dir"], FINAL_FILE))
+            frames.append(records.assign(Station=result["name"]))
+    if not frames:
+        return 0
+    store = pd.concat(frames, ignore_index=True)
+    write_table(store, os.path.join(root_dir, store_dir), extra_meta={"stations": [frame["Station"].iloc[0] for frame in frames]})
+    return len(store)
+
+def run_batch(root_dir=ROOT_DIR, stations=None, workers=None, store_dir=STORE_DIR):
+    """
+    Processes every station directory in parallel across a process pool,
+    printing progress as each station finishes, then builds the consolidated
+    schedule store. Returns the per-station results.
+    """
+    stations = stations if stations is not None else find_stations(root_dir)
+    print(f"Processing {len(stations)} stations...")
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_station, station, root_dir) for station in stations]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"  [{done}/{len(stations)}] {result['name']}: {result['records']} records in {result['seconds']:.2f}s")
+            else:
+                print(f"  [{done}/{len(stations)}] {result['name']}: FAILED - {result['error']}")
+
+    results.sort(key=lambda result: result["name"])
+    rows = build_store(results, root_dir, store_dir)
+    failed = [result["name"] for result in results if result["status"] != "ok"]
+    print(f"\nBatch complete in {time.perf_counter() - started:.2f}s: {len(results) - len(failed)} stations ok, "
+          f"{len(failed)} failed{' (' + ', '.join(failed) + ')' if failed else ''}.")
+    print(f"Consolidated store of {rows} records saved to '{os.path.join(root_dir, store_dir)}'.")
+    return results
+
+if __name__ == '__main__':
+    run_batch()
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import clean1
+import disruptionsindata
+import jsonconv
+import prority
+import synthetic
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT_DIR, 'mapping'))
+import maping
+from event_sinks import NullSink
+from simulation import TrainSimulator
+
+RESULTS_FILE = 'benchmark_results.json'
+
+# (trains, stations) pairs benchmarked by default. Only the two end stations
+# carry station data; create_section_schedule synthesizes the stops in between,
+# so the station count sets the length of every path, not how much station
+# data is read.
+SIZES = [(100, 3), (1_000, 3), (1_000, 50), (10_000, 20)]
+
+# Added with --large. The section schedule holds one dict per path step and
+# measure() builds it twice, so this needs several GiB of memory.
+LARGE_SIZES = [(100_000, 20)]
+
+# The tick engine does trains x minutes work, so it is only run up to this size
+TICK_ENGINE_MAX_TRAINS = 1_000
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func twice: once for wall time and once under tracemalloc for peak
+    memory, with stdout silenced both times. Returns (seconds, peak_bytes, result).
+    """
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - started
+
+        tracemalloc.start()
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, result
+
+def simulate(network, schedule, event_driven):
+    sim = TrainSimulator(network, schedule, sink=NullSink())
+    sim.initialize(start_time_str="00:00")
+    if event_driven:
+        sim.run_event_driven(duration_mins=1440)
+    else:
+        sim.run(duration_mins=1440)
+
+def benchmark_size(n_trains, n_stations, work_dir, seed=0):
+    """Generates a dataset of one size and times every stage on it."""
+    paths = synthetic.generate_dataset(work_dir, n_trains, n_stations, seed)
+    with open(paths["network"], 'r') as f:
+        network = json.load(f)
+
+    def out(name):
+        return os.path.join(work_dir, name)
+
+    stages = [
+        ("clean_new_data", clean1.clean_new_data, (paths["first_csv"], out('cleaned.csv'))),
+        ("prioritize_data", prority.prioritize_data, (out('cleaned.csv'), out('priority.csv'))),
+        ("convert_csv_to_json", jsonconv.convert_csv_to_json, (out('priority.csv'), out('final.json'))),
+        ("inject_disruptions", disruptionsindata.inject_disruptions, (out('final.json'), out('disruptions.json'))),
+        ("create_section_schedule", maping.create_section_schedule, (paths["first_json"], paths["last_json"], network)),
+    ]
+
+    results = {}
+    schedule = None
+    for name, func, args in stages:
+        seconds, peak, result = measure(func, *args)
+        results[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        if name == "create_section_schedule":
+            schedule = result
+
+    engines = [("simulate_event_driven", True)]
+    if n_trains <= TICK_ENGINE_MAX_TRAINS:
+        engines.append(("simulate_tick", False))
+    for name, event_driven in engines:
+        seconds, peak, _ = measure(simulate, network, schedule, event_driven)
+        results[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+    return results
+
+def run_benchmarks(sizes=SIZES, results_filepath=RESULTS_FILE, seed=0):
+    """
+    Benchmarks every stage at every size, appends the run to the results file
+    and prints how it compares with the previous run.
+    """
+    run = {"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'), "seed": seed, "sizes": {}}
+    for n_trains, n_stations in sizes:
+        key = f"{n_trains}x{n_stations}"
+        print(f"Benchmarking {n_trains} trains over {n_stations} stations...")
+        with tempfile.TemporaryDirectory() as work_dir:
+            run["sizes"][key] = benchmark_size(n_trains, n_stations, work_dir, seed)
+        for stage, numbers in run["sizes"][key].items():
+            print(f"  {stage:<25} {numbers['seconds']:>10.4f}s {numbers['peak_bytes'] / 2**20:>10.1f} MiB")
+
+    try:
+        with open(results_filepath, 'r') as f:
+            history = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        history = []
+    if history:
+        compare_runs(history[-1], run)
+    history.append(run)
+    with open(results_filepath, 'w') as f:
+        json.dump(history, f, indent=4)
+    print(f"\nResults saved to '{results_filepath}'.")
+    return run
+
+def compare_runs(previous, current, threshold=1.2):
+    """Prints stages that got slower than `threshold` times the previous run."""
+    print(f"\nComparing with run from {previous['timestamp']}:")
+    regressions = 0
+    for size, stages in current["sizes"].items():
+        for stage, numbers in stages.items():
+            before = previous["sizes"].get(size, {}).get(stage)
+            if not before or not before["seconds"]:
+                continue
+            ratio = numbers["seconds"] / before["seconds"]
+            if ratio > threshold:
+                regressions += 1
+                print(f"  REGRESSION {size} {stage}: {before['seconds']:.4f}s -> {numbers['seconds']:.4f}s ({ratio:.2f}x)")
+    if not regressions:
+        print("  No stage is slower than before.")
+
+if __name__ == '__main__':
+    run_benchmarks(SIZES + LARGE_SIZES if '--large' in sys.argv[1:] else SIZES)
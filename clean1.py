@@ -1,5 +1,16 @@
 import pandas as pd
 
+from schema import apply_schema, is_text, to_text
+
+# Headers based on the observed structure of the row-spanning raw file.
+# We give names to all potential columns to handle ragged rows.
+RAW_HEADERS = [
+    'train_no_1', 'href_1', 'train_name_1', 'from_station', 'to_station',
+    'scheduled_arrival', 'scheduled_departure', 'halt_time', 'c1', 'c2',
+    'c3', 'c4', 'c5', 'c6', 'c7', 'train_no_2', 'href_2', 'train_name_2',
+    'c8', 'c9'
+]
+
 def clean_new_data(input_filepath, output_filepath):
     """
     Cleans the raw scraped train data from etrain (2).csv, which has a
@@ -7,18 +18,9 @@ def clean_new_data(input_filepath, output_filepath):
     """
     print(f"Starting data cleaning for '{input_filepath}'...")
 
-    # Define headers based on the observed structure of the new raw file.
-    # We give names to all potential columns to handle ragged rows.
-    headers = [
-        'train_no_1', 'href_1', 'train_name_1', 'from_station', 'to_station',
-        'scheduled_arrival', 'scheduled_departure', 'halt_time', 'c1', 'c2',
-        'c3', 'c4', 'c5', 'c6', 'c7', 'train_no_2', 'href_2', 'train_name_2',
-        'c8', 'c9'
-    ]
-
     try:
         # Load the CSV, skipping the original header and applying new ones.
-        df = pd.read_csv(input_filepath, header=0, names=headers, on_bad_lines='skip')
+        df = pd.read_csv(input_filepath, header=0, names=RAW_HEADERS, on_bad_lines='skip')
     except FileNotFoundError:
         print(f"Error: The file '{input_filepath}' was not found.")
         return
@@ -48,18 +50,19 @@ def clean_new_data(input_filepath, output_filepath):
     placeholders = ['--', '-', 'RT', 'Y', 'X']
     for col in df_clean.columns:
         df_clean[col] = df_clean[col].replace(placeholders, pd.NA)
-        if df_clean[col].dtype == 'object':
+        if is_text(df_clean[col]):
             df_clean[col] = df_clean[col].str.strip()
 
     # Drop rows that don't have any station information.
     df_clean.dropna(subset=['From_Station', 'To_Station'], how='all', inplace=True)
 
-    # Ensure train numbers are valid integers.
-    df_clean['Train_No'] = pd.to_numeric(df_clean['Train_No'], errors='coerce').astype('Int64')
+    # Convert to the shared schema, which also makes train numbers integers,
+    # and drop rows whose train number is not valid.
+    df_clean = apply_schema(df_clean)
     df_clean.dropna(subset=['Train_No'], inplace=True)
 
     # Save the clean data to a new CSV file.
-    df_clean.to_csv(output_filepath, index=False)
+    to_text(df_clean).to_csv(output_filepath, index=False)
     print(f"Cleaning complete. Cleaned data saved to '{output_filepath}'.")
 
 
@@ -0,0 +1,109 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from schema import INT_COLUMNS, NULL, TIME_COLUMNS, decode_minutes, decode_time_columns, encode_minutes, nullable
+
+# A columnar table is a directory holding one .npy file per column plus a
+# meta.json describing how to decode them. Columns are memory-mapped on load,
+# so reading a table does not parse or copy the data.
+FORMAT_NAME = "railway-columnar"
+FORMAT_VERSION = 1
+TABLE_SUFFIX = ".cols"
+
+# The same directory format also holds compiled schedule bundles and simulation
+# traces; meta.json's "kind" says which. Tables written before it was recorded
+# have no kind and are tables.
+TABLE_KIND = "table"
+
+def is_columnar(path):
+    """True if `path` is a columnar table directory (not a bundle or trace)."""
+    try:
+        read_meta(path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+def write_table(df, output_dir, extra_meta=None):
+    """
+    Writes a DataFrame as a columnar table. Time columns become int16 minutes,
+    known integer columns get their fixed type, and text columns become
+    categorical codes with the categories kept in meta.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        spec = {"name": name}
+        if name in TIME_COLUMNS:
+            spec.update(kind="minutes", dtype="int16")
+            values = encode_minutes(column)
+        elif name in INT_COLUMNS:
+            spec.update(kind="int", dtype=INT_COLUMNS[name])
+            values = pd.to_numeric(column, errors='coerce').fillna(NULL).to_numpy(dtype=INT_COLUMNS[name])
+        elif pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            spec.update(kind="float", dtype="float64")
+            values = column.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            codes, categories = pd.factorize(column.astype('object'), use_na_sentinel=True)
+            dtype = 'int16' if len(categories) < np.iinfo(np.int16).max else 'int32'
+            spec.update(kind="category", dtype=dtype, categories=[str(c) for c in categories])
+            values = codes.astype(dtype)
+        np.save(os.path.join(output_dir, f"{name}.npy"), values)
+        columns.append(spec)
+
+    meta = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "kind": TABLE_KIND, "rows": len(df), "columns": columns}
+    meta.update(extra_meta or {})
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+def read_meta(input_dir, kind=TABLE_KIND):
+    """Reads the meta.json of a columnar directory and checks it holds the expected kind."""
+    with open(os.path.join(input_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_NAME:
+        raise ValueError(f"'{input_dir}' is not a {FORMAT_NAME} directory.")
+    found = meta.get("kind", TABLE_KIND)
+    if found != kind:
+        raise ValueError(f"'{input_dir}' holds a {found}, not a {kind}.")
+    return meta
+
+def read_table(input_dir, decode_times=False):
+    """
+    Loads a columnar table as a DataFrame whose columns are backed by the
+    memory-mapped files. Integer and time columns come back as nullable
+    integers and text columns as categoricals. Pass decode_times=True to get
+    HH:MM strings instead of minutes.
+    """
+    meta = read_meta(input_dir)
+    data = {}
+    for spec in meta["columns"]:
+        values = np.load(os.path.join(input_dir, f"{spec['name']}.npy"), mmap_mode='r')
+        if spec["kind"] == "category":
+            data[spec["name"]] = pd.Categorical.from_codes(values, categories=spec["categories"])
+        elif spec["kind"] == "minutes" and decode_times:
+            data[spec["name"]] = decode_minutes(values)
+        elif spec["kind"] in ("minutes", "int"):
+            data[spec["name"]] = nullable(values)
+        else:
+            data[spec["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+def read_records(input_path):
+    """
+    Loads station records from either a JSON array or a columnar table, so
+    downstream stages can take whichever the previous stage wrote.
+    """
+    if os.path.isdir(input_path):
+        # read_table says so if the directory is a bundle or trace instead
+        return read_table(input_path)
+    with open(input_path, 'r') as f:
+        return pd.DataFrame(json.load(f))
+
+def export_json(input_dir, output_filepath):
+    """Exports a columnar table as the JSON array format used by the other stages."""
+    df = decode_time_columns(read_table(input_dir)).astype('object')
+    df = df.where(pd.notnull(df), None)
+    with open(output_filepath, 'w') as f:
+        json.dump(df.to_dict(orient='records'), f, indent=4)
@@ -1,77 +1,105 @@
 import json
-import random
+
+import numpy as np
 import pandas as pd
 
-def parse_time_and_add_delay(time_str, delay_minutes):
+from columnar import TABLE_SUFFIX, read_records, write_table
+from schema import MINUTE_LABELS, apply_schema, to_records
+
+# Possible real-world disruptions. Each type has its own probability of hitting
+# a given train, and a delay distribution: 'uniform' draws whole minutes between
+# min_delay and max_delay, 'exponential' draws around mean_delay and is clipped
+# to the same bounds.
+DISRUPTION_TYPES = [
+    {"type": "Engine Failure", "probability": 0.0625, "distribution": "uniform", "min_delay": 30, "max_delay": 90},
+    {"type": "Signal Fault Ahead", "probability": 0.0625, "distribution": "uniform", "min_delay": 10, "max_delay": 25},
+    {"type": "Track Maintenance", "probability": 0.0625, "distribution": "uniform", "min_delay": 20, "max_delay": 45},
+    {"type": "Platform Congestion", "probability": 0.0625, "distribution": "uniform", "min_delay": 5, "max_delay": 15},
+]
+
+def add_delay_to_times(times, delays):
     """
-    Adds delay to a time string (HH:MM) and returns a new time string.
+    Adds a delay in minutes to a column of HH:MM strings and returns a new column.
+    Missing times stay missing and badly formatted times are returned unchanged.
+    Integer columns (minutes from a columnar table) stay in minutes.
     """
-    if not time_str or pd.isna(time_str):
-        return None
-    try:
-        time_obj = pd.to_datetime(time_str, format='%H:%M')
-        delayed_time = time_obj + pd.Timedelta(minutes=delay_minutes)
-        return delayed_time.strftime('%H:%M')
-    except (ValueError, TypeError):
-        return time_str # Return original if format is incorrect
+    if pd.api.types.is_integer_dtype(times):
+        return ((times + delays) % 1440).astype(times.dtype)
+    times = pd.Series(times, dtype='object')
+    parsed = pd.to_datetime(times, format='%H:%M', errors='coerce')
+    valid = parsed.notna().to_numpy()
+
+    minutes = (parsed.dt.hour * 60 + parsed.dt.minute).to_numpy()
+    delayed = times.to_numpy(copy=True)
+    delayed[valid] = MINUTE_LABELS[(minutes[valid].astype(np.int64) + np.asarray(delays)[valid]) % 1440]
+    delayed[times.isna().to_numpy()] = None
+    return pd.Series(delayed, index=times.index, dtype='object')
+
+def draw_disruptions(count, rng, disruption_types=DISRUPTION_TYPES):
+    """
+    Draws disruptions for `count` trains at once. Returns an array of type
+    indices (-1 for no disruption) and an array of delays in minutes.
+    """
+    probabilities = np.array([d['probability'] for d in disruption_types], dtype=float)
+    if probabilities.sum() > 1:
+        raise ValueError("Disruption probabilities must not add up to more than 1.")
+
+    # One uniform draw per train picks the disruption type by cumulative probability
+    type_index = np.searchsorted(np.cumsum(probabilities), rng.random(count), side='right')
+    type_index[type_index == len(disruption_types)] = -1
+
+    delays = np.zeros(count, dtype=np.int64)
+    for i, disruption in enumerate(disruption_types):
+        hit = np.flatnonzero(type_index == i)
+        if not len(hit):
+            continue
+        low, high = disruption['min_delay'], disruption['max_delay']
+        if disruption.get('distribution', 'uniform') == 'exponential':
+            drawn = np.rint(rng.exponential(disruption['mean_delay'], len(hit)))
+            delays[hit] = np.clip(drawn, low, high)
+        else:
+            delays[hit] = rng.integers(low, high + 1, len(hit))
+    return type_index, delays
 
-def inject_disruptions(input_filepath, output_filepath):
+def inject_disruptions(input_filepath, output_filepath, disruption_types=DISRUPTION_TYPES, seed=None):
     """
-    Reads a clean JSON schedule and injects random delays and disruptions.
+    Reads a clean schedule (JSON or columnar) and injects random delays and
+    disruptions. All trains are disrupted in one batch; pass a seed for
+    repeatable scenarios. An output path ending in '.cols' is written as a
+    columnar table, anything else as JSON.
     """
     print(f"Reading clean schedule from '{input_filepath}'...")
     try:
-        with open(input_filepath, 'r') as f:
-            schedule = json.load(f)
+        schedule = apply_schema(read_records(input_filepath))
     except FileNotFoundError:
         print(f"Error: The file '{input_filepath}' was not found. Please run the previous scripts first.")
         return
 
-    # Define possible real-world disruptions
-    disruption_types = [
-        {"type": "Engine Failure", "min_delay": 30, "max_delay": 90},
-        {"type": "Signal Fault Ahead", "min_delay": 10, "max_delay": 25},
-        {"type": "Track Maintenance", "min_delay": 20, "max_delay": 45},
-        {"type": "Platform Congestion", "min_delay": 5, "max_delay": 15},
-    ]
-
-    disrupted_schedule = []
-    
-    # Set the probability of a train having a disruption (e.g., 25%)
-    PROBABILITY_OF_DISRUPTION = 0.25
-
     print("Injecting random real-world disruptions...")
-    for train in schedule:
-        if random.random() < PROBABILITY_OF_DISRUPTION:
-            # This train will have a disruption
-            disruption = random.choice(disruption_types)
-            delay = random.randint(disruption['min_delay'], disruption['max_delay'])
+    rng = np.random.default_rng(seed)
+    type_index, delays = draw_disruptions(len(schedule), rng, disruption_types)
+    type_names = np.array([d['type'] for d in disruption_types] + [None], dtype=object)
 
-            # Add new keys to the train's data
-            train['Disruption_Type'] = disruption['type']
-            train['Delay_Mins'] = delay
-            
-            # Calculate new, delayed arrival and departure times
-            train['Actual_Arrival'] = parse_time_and_add_delay(train['Scheduled_Arrival'], delay)
-            train['Actual_Departure'] = parse_time_and_add_delay(train['Scheduled_Departure'], delay)
-            
-            print(f"  - DISRUPTION: Train {train['Train_No']} ({train['Train_Name']}) hit a '{disruption['type']}' causing a {delay} min delay.")
-        else:
-            # This train is on time
-            train['Disruption_Type'] = None
-            train['Delay_Mins'] = 0
-            train['Actual_Arrival'] = train['Scheduled_Arrival']
-            train['Actual_Departure'] = train['Scheduled_Departure']
+    schedule['Disruption_Type'] = type_names[type_index]
+    schedule['Delay_Mins'] = delays
+    schedule['Actual_Arrival'] = add_delay_to_times(schedule['Scheduled_Arrival'], delays)
+    schedule['Actual_Departure'] = add_delay_to_times(schedule['Scheduled_Departure'], delays)
 
-        disrupted_schedule.append(train)
+    counts = schedule['Disruption_Type'].value_counts()
+    for disruption_type, count in counts.items():
+        print(f"  - {disruption_type}: {count} trains")
+    print(f"  - {len(schedule) - counts.sum()} trains on time")
 
     # Save the new, disrupted schedule to a file
-    with open(output_filepath, 'w') as f:
-        json.dump(disrupted_schedule, f, indent=4)
+    if output_filepath.endswith(TABLE_SUFFIX):
+        write_table(schedule, output_filepath)
+    else:
+        with open(output_filepath, 'w') as f:
+            json.dump(to_records(schedule), f, indent=4)
 
     print(f"\nDisruption injection complete. New schedule saved to '{output_filepath}'.")
 
 if __name__ == '__main__':
     clean_schedule_file = 'etrain_final.json'
     disrupted_schedule_file = 'etrain_with_disruptions.json'
-    inject_disruptions(clean_schedule_file, disrupted_schedule_file)
\ No newline at end of file
+    inject_disruptions(clean_schedule_file, disrupted_schedule_file)
@@ -1,20 +1,21 @@
 import pandas as pd
 import json
 
+from columnar import write_table
+from schema import apply_schema, to_records
+
 def convert_csv_to_json(input_filepath, output_filepath):
     """
     Converts the final prioritized CSV data into a clean JSON array file.
     """
     print(f"Reading data from '{input_filepath}' to convert to JSON...")
     try:
-        # Read the final CSV data
-        df = pd.read_csv(input_filepath)
-        
-        # Replace pandas' NaN (Not a Number) with None so it becomes 'null' in JSON
-        df = df.where(pd.notnull(df), None)
+        # Read the final CSV data into the shared schema
+        df = apply_schema(pd.read_csv(input_filepath))
         
-        # Convert the DataFrame to a list of dictionaries (records orientation)
-        json_result = df.to_dict(orient='records')
+        # Convert the DataFrame to a list of dictionaries (records orientation),
+        # with None for missing values so they become 'null' in JSON
+        json_result = to_records(df)
         
         # Save the JSON data to a file with pretty printing for readability
         with open(output_filepath, 'w') as f:
@@ -26,6 +27,21 @@ def convert_csv_to_json(input_filepath, output_filepath):
         print(f"Error: The file '{input_filepath}' was not found. Please run the priority script first.")
         return
 
+def convert_csv_to_columnar(input_filepath, output_dir):
+    """
+    Converts the final prioritized CSV data into a columnar table directory,
+    the binary alternative to convert_csv_to_json for the later stages.
+    """
+    print(f"Reading data from '{input_filepath}' to convert to a columnar table...")
+    try:
+        df = apply_schema(pd.read_csv(input_filepath))
+    except FileNotFoundError:
+        print(f"Error: The file '{input_filepath}' was not found. Please run the priority script first.")
+        return
+
+    write_table(df, output_dir)
+    print(f"Conversion complete. Columnar data saved to '{output_dir}'.")
+
 if __name__ == '__main__':
     prioritized_file = 'etrain_with_priority.csv'
     json_file = 'etrain_final.json'
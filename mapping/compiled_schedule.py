@@ -0,0 +1,262 @@
+import copy
+import json
+import os
+from array import array
+
+# Integer codes for the event types found in a train's path
+DEPARTURE, TRAVERSE, ARRIVAL, HALT = 0, 1, 2, 3
+EVENT_TYPES = {"DEPARTURE": DEPARTURE, "TRAVERSE": TRAVERSE, "ARRIVAL": ARRIVAL, "HALT": HALT}
+
+NO_TIME = -1
+
+# Priority given to entries without one; matches the default in prority.py.
+# A lower number means a higher priority.
+DEFAULT_PRIORITY = 5
+
+
+def parse_minutes(time_str):
+    """Converts an 'HH:MM' string into minutes since midnight, or NO_TIME if missing."""
+    if not time_str:
+        return NO_TIME
+    hours, minutes = time_str.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes):
+    """Converts minutes since midnight back into an 'HH:MM' string."""
+    minutes %= 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class TrainState:
+    """Mutable position of a single train during a simulation run."""
+    __slots__ = ("location", "status", "path_index")
+
+    def __init__(self, location, status, path_index):
+        self.location = location
+        self.status = status
+        self.path_index = path_index
+
+    def __repr__(self):
+        return f"TrainState(location={self.location!r}, status={self.status!r}, path_index={self.path_index})"
+
+
+class CompiledSchedule:
+    """
+    Array-backed form of a JSON 'train_schedule'.
+
+    Every path step of every train is flattened into parallel arrays. The steps
+    of schedule entry i live at positions path_start[i] .. path_start[i + 1] - 1.
+    Station and segment IDs are interned into integer codes, and times are held
+    as integer minutes since midnight so they are parsed exactly once.
+    """
+
+    def __init__(self, network_model, train_schedule):
+        self.station_ids = []
+        self.station_codes = {}
+        self.segment_ids = [segment['id'] for segment in network_model['segments']]
+        self.segment_codes = {segment_id: code for code, segment_id in enumerate(self.segment_ids)}
+        for station in network_model.get('stations', []):
+            self._station_code(station['id'])
+
+        self.train_nos = array('l')
+        self.train_names = []
+        self.directions = []
+        self.priorities = array('b')
+        self.days = array('l')
+        self.path_start = array('l', [0])
+        self.step_type = array('b')
+        self.step_ref = array('l')
+        self.step_time = array('l')
+
+        for train in train_schedule:
+            self.train_nos.append(train['Train_No'])
+            self.train_names.append(train.get('Train_Name'))
+            self.directions.append(train.get('direction'))
+            self.priorities.append(train.get('Priority') or DEFAULT_PRIORITY)
+            self.days.append(train.get('day', 0))
+            for event in train['path']:
+                event_type = EVENT_TYPES[event['type']]
+                self.step_type.append(event_type)
+                if event_type == TRAVERSE:
+                    self.step_ref.append(self._segment_code(event['segment_id']))
+                else:
+                    self.step_ref.append(self._station_code(event['station_id']))
+                self.step_time.append(parse_minutes(event.get('time')))
+            self.path_start.append(len(self.step_type))
+
+    def __len__(self):
+        return len(self.train_nos)
+
+    def _station_code(self, station_id):
+        code = self.station_codes.get(station_id)
+        if code is None:
+            code = self.station_codes[station_id] = len(self.station_ids)
+            self.station_ids.append(station_id)
+        return code
+
+    def _segment_code(self, segment_id):
+        code = self.segment_codes.get(segment_id)
+        if code is None:
+            code = self.segment_codes[segment_id] = len(self.segment_ids)
+            self.segment_ids.append(segment_id)
+        return code
+
+    def path_length(self, index):
+        """Number of path steps of schedule entry `index`."""
+        return self.path_start[index + 1] - self.path_start[index]
+
+    def step(self, index, path_index):
+        """Flat array position of step `path_index` of schedule entry `index`."""
+        return self.path_start[index] + path_index
+
+    def start_clock(self, index):
+        """First timed step of entry `index`, in minutes from midnight of day 0."""
+        for position in range(self.path_start[index], self.path_start[index + 1]):
+            if self.step_time[position] != NO_TIME:
+                return self.days[index] * 1440 + self.step_time[position]
+        return NO_TIME
+
+    def absolute_times(self, index, day=0):
+        """
+        Times of every step of entry `index` in minutes from midnight of day 0,
+        counting the entry's day offset plus `day`. A step earlier in the day
+        than the one before it is taken to be on the next day, so overnight and
+        multi-day runs keep increasing. Untimed steps stay NO_TIME.
+        """
+        base = (self.days[index] + day) * 1440
+        times = []
+        last = None
+        for position in range(self.path_start[index], self.path_start[index + 1]):
+            minutes = self.step_time[position]
+            if minutes == NO_TIME:
+                times.append(NO_TIME)
+                continue
+            minutes += base
+            if last is not None and minutes < last:
+                base += 1440
+                minutes += 1440
+            times.append(minutes)
+            last = minutes
+        return times
+
+    def with_delays(self, delays):
+        """
+        Returns a copy of the schedule in which every timed step of entry i is
+        shifted by delays[i] minutes. A run pushed past midnight moves to the
+        next day through its day offset instead of wrapping round to early the
+        same day. Arrays other than the times and day offsets are shared.
+        """
+        delayed = copy.copy(self)
+        step_time = array('l', self.step_time)
+        days = array('l', self.days)
+        for index, delay in enumerate(delays):
+            if not delay:
+                continue
+            first = True
+            for position in range(self.path_start[index], self.path_start[index + 1]):
+                if step_time[position] == NO_TIME:
+                    continue
+                shifted = step_time[position] + delay
+                if first:
+                    # Later steps follow on from the first, as in absolute_times
+                    days[index] += shifted // 1440
+                    first = False
+                step_time[position] = shifted % 1440
+        delayed.step_time = step_time
+        delayed.days = days
+        return delayed
+
+    def __getstate__(self):
+        # Arrays memory-mapped by load_compiled are memoryviews, which cannot be
+        # pickled; turn them into plain arrays when shipping to another process.
+        state = dict(self.__dict__)
+        for name, value in state.items():
+            if isinstance(value, memoryview):
+                state[name] = array(value.format, value)
+        return state
+
+    def ref_id(self, position):
+        """Station or segment ID referenced by the step at flat `position`."""
+        code = self.step_ref[position]
+        if self.step_type[position] == TRAVERSE:
+            return self.segment_ids[code]
+        return self.station_ids[code]
+
+
+def compile_schedule(network_model, train_schedule):
+    """Compiles a JSON train schedule into a CompiledSchedule."""
+    return CompiledSchedule(network_model, train_schedule)
+
+
+# Array fields of a CompiledSchedule and the NumPy type each is stored as
+BUNDLE_ARRAYS = {
+    "train_nos": "int32",
+    "path_start": "int32",
+    "step_type": "int8",
+    "step_ref": "int32",
+    "step_time": "int16",
+    "priorities": "int8",
+    "days": "int16",
+}
+
+# Values for arrays missing from bundles written before they were added
+BUNDLE_DEFAULTS = {"priorities": DEFAULT_PRIORITY, "days": 0}
+
+
+def save_compiled(compiled, network_model, output_dir):
+    """
+    Saves a compiled schedule and its network model as a bundle directory of
+    .npy arrays plus a meta.json, which load_compiled can memory-map.
+    """
+    import numpy as np
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name, dtype in BUNDLE_ARRAYS.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), np.asarray(getattr(compiled, name), dtype=dtype))
+    meta = {
+        "format": "railway-columnar",
+        "version": 1,
+        "kind": "compiled_schedule",
+        "network_model": network_model,
+        "station_ids": compiled.station_ids,
+        "segment_ids": compiled.segment_ids,
+        "train_names": compiled.train_names,
+        "directions": compiled.directions,
+    }
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+def is_compiled_bundle(path):
+    """True if `path` is a bundle directory written by save_compiled."""
+    return os.path.isfile(os.path.join(path, 'meta.json')) and os.path.isfile(os.path.join(path, 'step_time.npy'))
+
+
+def load_compiled(input_dir):
+    """
+    Loads a bundle written by save_compiled. The arrays are memory-mapped and
+    exposed as memoryviews, so nothing is parsed or copied.
+    Returns (network_model, compiled).
+    """
+    import numpy as np
+
+    with open(os.path.join(input_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    if meta.get("kind") != "compiled_schedule":
+        raise ValueError(f"'{input_dir}' is not a compiled schedule bundle.")
+
+    compiled = CompiledSchedule.__new__(CompiledSchedule)
+    compiled.station_ids = meta["station_ids"]
+    compiled.station_codes = {station_id: code for code, station_id in enumerate(compiled.station_ids)}
+    compiled.segment_ids = meta["segment_ids"]
+    compiled.segment_codes = {segment_id: code for code, segment_id in enumerate(compiled.segment_ids)}
+    compiled.train_names = meta["train_names"]
+    compiled.directions = meta["directions"]
+    for name in BUNDLE_ARRAYS:
+        array_path = os.path.join(input_dir, f"{name}.npy")
+        if name in BUNDLE_DEFAULTS and not os.path.isfile(array_path):
+            setattr(compiled, name, array('l', [BUNDLE_DEFAULTS[name]]) * len(compiled.train_names))
+            continue
+        setattr(compiled, name, memoryview(np.load(array_path, mmap_mode='r')))
+    return meta["network_model"], compiled
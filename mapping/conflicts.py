@@ -0,0 +1,123 @@
+import heapq
+import json
+from collections import Counter
+
+from compiled_schedule import ARRIVAL, DEPARTURE, NO_TIME, TRAVERSE, CompiledSchedule, compile_schedule, format_minutes
+
+MINUTES_PER_DAY = 1440
+
+# Trains a segment can hold at once, per direction (double line) or shared
+# by both directions (single line). A segment's own 'capacity' key overrides this.
+TRACK_CAPACITY = {"double": 1, "single": 1}
+SHARED_TRACK_TYPES = {"single"}
+
+
+def segment_occupancy(network_model, compiled):
+    """
+    Lists the planned occupancy of every segment as (segment_id, direction,
+    start, end, schedule index) tuples, one per TRAVERSE step. Times are
+    minutes since midnight; a traversal that runs past midnight ends after 1440.
+    """
+    segments = {segment['id']: segment for segment in network_model['segments']}
+    intervals = []
+    for index in range(len(compiled)):
+        first, last = compiled.path_start[index], compiled.path_start[index + 1]
+        for position in range(first + 1, last - 1):
+            if compiled.step_type[position] != TRAVERSE:
+                continue
+            before, after = position - 1, position + 1
+            if compiled.step_type[before] != DEPARTURE or compiled.step_type[after] != ARRIVAL:
+                continue
+            start, end = compiled.step_time[before], compiled.step_time[after]
+            if start == NO_TIME or end == NO_TIME:
+                continue
+            if end < start:
+                end += MINUTES_PER_DAY
+
+            segment_id = compiled.ref_id(position)
+            segment = segments.get(segment_id, {})
+            direction = "DOWN" if compiled.ref_id(before) == segment.get('from') else "UP"
+            intervals.append((segment_id, direction, start, end, index))
+    return intervals
+
+
+def find_conflicts(network_model, schedule):
+    """
+    Finds every pair of planned traversals that overlap on a segment beyond
+    its capacity, using one sweep line per segment track. A double line is
+    checked per direction, a single line across both. `schedule` is either a
+    JSON train_schedule or a CompiledSchedule.
+
+    The timetable repeats daily, so traversals that run past midnight are also
+    checked against the next morning's trains. Entries with the same Train_No
+    are never reported against each other.
+    """
+    compiled = schedule if isinstance(schedule, CompiledSchedule) else compile_schedule(network_model, schedule)
+    segments = {segment['id']: segment for segment in network_model['segments']}
+
+    tracks = {}
+    for segment_id, direction, start, end, index in segment_occupancy(network_model, compiled):
+        segment = segments.get(segment_id, {})
+        track = (segment_id, None if segment.get('type') in SHARED_TRACK_TYPES else direction)
+        tracks.setdefault(track, []).append((start, end, index))
+        if end > MINUTES_PER_DAY:
+            # The part after midnight also meets the next day's early trains
+            tracks[track].append((start - MINUTES_PER_DAY, end - MINUTES_PER_DAY, index))
+
+    conflicts = []
+    seen = set()
+    for (segment_id, direction), intervals in tracks.items():
+        segment = segments.get(segment_id, {})
+        capacity = segment.get('capacity', TRACK_CAPACITY.get(segment.get('type'), 1))
+        intervals.sort()
+        active = []  # heap of (end, start, index) for traversals still on the track
+        for start, end, index in intervals:
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            if len(active) >= capacity:
+                for other_end, other_start, other in active:
+                    if compiled.train_nos[other] == compiled.train_nos[index]:
+                        continue
+                    pair = (segment_id, direction, min(index, other), max(index, other))
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    conflicts.append({
+                        "segment_id": segment_id,
+                        "direction": direction or "BOTH",
+                        "train_a": compiled.train_nos[other],
+                        "train_b": compiled.train_nos[index],
+                        "schedule_index_a": other,
+                        "schedule_index_b": index,
+                        "overlap_start": format_minutes(max(start, other_start)),
+                        "overlap_end": format_minutes(min(end, other_end)),
+                        "overlap_mins": min(end, other_end) - max(start, other_start),
+                    })
+            heapq.heappush(active, (end, start, index))
+    return conflicts
+
+
+def conflict_summary(conflicts):
+    """Counts conflicts per segment and direction."""
+    return Counter((conflict['segment_id'], conflict['direction']) for conflict in conflicts)
+
+
+def check_timetable(simulation_filepath):
+    """Loads a simulation file and lists the planned conflicts in its timetable."""
+    print(f"Checking '{simulation_filepath}' for planned conflicts...")
+    try:
+        with open(simulation_filepath, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error loading simulation file: {e}")
+        return []
+
+    conflicts = find_conflicts(data['network_model'], data['train_schedule'])
+    for (segment_id, direction), count in sorted(conflict_summary(conflicts).items()):
+        print(f"  - {segment_id} ({direction}): {count} conflicts")
+    print(f"Found {len(conflicts)} planned conflicts.")
+    return conflicts
+
+
+if __name__ == '__main__':
+    check_timetable('bpl_et_common_trains.json')
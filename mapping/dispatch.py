@@ -0,0 +1,165 @@
+import heapq
+import json
+import time
+
+from compiled_schedule import compile_schedule, format_minutes
+from conflicts import SHARED_TRACK_TYPES, TRACK_CAPACITY
+from event_sinks import ARRIVED, DEPARTED, EVENTS, RingBufferSink
+
+MINUTES_PER_DAY = 1440
+
+
+class TrackOccupancy:
+    """
+    Trains on every segment track, by the same rules as find_conflicts in
+    conflicts.py: a double line has one track per direction and a single line
+    one track shared by both, each holding up to the segment's capacity. With
+    by_type=False every segment is a single shared track with room for one
+    train, the simulator's original model.
+    """
+
+    def __init__(self, network_model, by_type=True):
+        self.ends = {}
+        self.shared = {}
+        self.capacity = {}
+        for segment in network_model['segments']:
+            segment_id = segment['id']
+            self.ends[segment_id] = (segment['from'], segment['to'])
+            if by_type:
+                self.shared[segment_id] = segment.get('type') in SHARED_TRACK_TYPES
+                self.capacity[segment_id] = segment.get('capacity', TRACK_CAPACITY.get(segment.get('type'), 1))
+            else:
+                self.shared[segment_id], self.capacity[segment_id] = True, 1
+        # Occupants of every track that has any, in order of entry
+        self.occupants = {}
+
+    def track(self, segment_id, from_station):
+        """Key of the track a train leaving `from_station` takes onto `segment_id`."""
+        return (segment_id, None if self.shared[segment_id] else from_station)
+
+    def blocker(self, track):
+        """The first train on a full track, or None if the track has room."""
+        occupants = self.occupants.get(track, ())
+        return occupants[0] if len(occupants) >= self.capacity[track[0]] else None
+
+    def enter(self, track, occupant):
+        self.occupants.setdefault(track, []).append(occupant)
+
+    def leave(self, segment_id, occupant):
+        """Takes `occupant` off whichever track of `segment_id` it is on. Returns that track."""
+        tracks = [(segment_id, None)] if self.shared[segment_id] else [(segment_id, end) for end in self.ends[segment_id]]
+        for track in tracks:
+            occupants = self.occupants.get(track)
+            if occupants and occupant in occupants:
+                occupants.remove(occupant)
+                if not occupants:
+                    del self.occupants[track]
+                return track
+        return None
+
+    def departure_stations(self, track):
+        """Stations whose trains depart onto `track`."""
+        segment_id, from_station = track
+        return self.ends[segment_id] if from_station is None else (from_station,)
+
+    def copy_occupants(self):
+        return {track: list(occupants) for track, occupants in self.occupants.items()}
+
+
+class DispatchQueues:
+    """
+    Trains held at stations because the segment they want to enter is
+    occupied. Each station keeps one heap per exit segment, ordered by
+    Priority (a lower number first), then by how late the train already is
+    (its earliest missed departure first), then by schedule order.
+    """
+
+    def __init__(self):
+        self.queues = {}
+
+    def hold(self, station_id, segment_id, priority, due, index, version):
+        """Holds schedule entry `index`, which was due to depart at clock `due`."""
+        heap = self.queues.setdefault(station_id, {}).setdefault(segment_id, [])
+        heapq.heappush(heap, (priority, due, index, version))
+
+    def release(self, segment_id, station_ids, is_current):
+        """
+        Removes and returns the best (priority, due, index, version) entry
+        waiting for `segment_id` at any of `station_ids`, or None. Entries for
+        which is_current(entry) is false are stale and are dropped on the way.
+        """
+        best = None
+        for station_id in station_ids:
+            heap = self.queues.get(station_id, {}).get(segment_id)
+            while heap and not is_current(heap[0]):
+                heapq.heappop(heap)
+            if heap and (best is None or heap[0] < best[0]):
+                best = (heap[0], heap)
+        if best is None:
+            return None
+        return heapq.heappop(best[1])
+
+    def discard(self, station_id, segment_id, entry):
+        """Removes one held entry, e.g. of a train that gave up waiting."""
+        heap = self.queues.get(station_id, {}).get(segment_id)
+        if heap and entry in heap:
+            heap.remove(entry)
+            heapq.heapify(heap)
+
+    def held(self):
+        """Yields (station_id, segment_id, entry) for every held entry, stale ones included."""
+        for station_id, queues in self.queues.items():
+            for segment_id, heap in queues.items():
+                for entry in heap:
+                    yield station_id, segment_id, entry
+
+    def waiting(self, station_id=None):
+        """Number of held entries, at one station or everywhere."""
+        stations = [self.queues.get(station_id, {})] if station_id else self.queues.values()
+        return sum(len(heap) for queues in stations for heap in queues.values())
+
+    def __len__(self):
+        return self.waiting()
+
+
+def replan(network_model, schedule, delays, start_time, duration_mins=MINUTES_PER_DAY):
+    """
+    Projects the timetable forward after a disruption. `delays` maps Train_No
+    to primary delay minutes; every train then runs its full path, halts
+    included, and the priority dispatcher resolves every conflict the delays
+    cause downstream. `schedule` is a JSON train_schedule or a
+    CompiledSchedule, which is only compiled once if reused.
+
+    Returns {train_no: [(kind, station_id, segment_id, clock), ...]} with the
+    projected DEPARTED and ARRIVED events of every train, clocks counted in
+    minutes from midnight of the start day.
+    """
+    from simulation import TrainSimulator
+
+    compiled = schedule if not isinstance(schedule, list) else compile_schedule(network_model, schedule)
+    recorder = RingBufferSink(capacity=None, level=EVENTS)
+    sim = TrainSimulator(network_model, None, compiled=compiled, sink=recorder, dispatch=True)
+    sim.initialize(start_time_str=start_time)
+    for train_no, minutes in delays.items():
+        sim.delay_train(train_no, minutes)
+    sim.run_event_driven(duration_mins=duration_mins)
+
+    projection = {}
+    for event in recorder.events:
+        if event.kind in (DEPARTED, ARRIVED):
+            projection.setdefault(event.train_no, []).append((event.kind, event.station_id, event.segment_id, event.time))
+    return projection
+
+
+if __name__ == '__main__':
+    with open('bpl_et_common_trains.json', 'r') as f:
+        data = json.load(f)
+    compiled = compile_schedule(data['network_model'], data['train_schedule'])
+
+    # Hold the Amarkantak Express 15 minutes and re-plan the rest of the day
+    started = time.perf_counter()
+    projection = replan(data['network_model'], compiled, {12854: 15}, "16:00")
+    elapsed = time.perf_counter() - started
+    print(f"Re-planned {len(projection)} trains in {elapsed * 1000:.1f} ms.")
+    for kind, station_id, segment_id, clock in projection.get(12854, []):
+        print(f"  12854 {kind} {station_id} ({segment_id}) at {format_minutes(clock)}")
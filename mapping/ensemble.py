@@ -0,0 +1,150 @@
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compiled_schedule import compile_schedule
+from event_sinks import NullSink
+from simulation import TrainSimulator
+
+# The disruption model is the one inject_disruptions uses, shared so the two cannot drift
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from disruptionsindata import DISRUPTION_TYPES, draw_disruptions
+
+# Set once per worker process by _init_worker so the compiled network and
+# schedule are shipped to each worker a single time, not once per scenario.
+_WORKER = {}
+
+
+class StreamingHistogram:
+    """
+    Running summary of an integer-valued metric. Only the count of each
+    distinct value is kept, so memory does not grow with the number of samples.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.sum = 0
+
+    def add(self, value):
+        self.counts[value] += 1
+        self.total += 1
+        self.sum += value
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+
+    def mean(self):
+        return self.sum / self.total if self.total else None
+
+    def percentile(self, q):
+        """Smallest value with at least q percent of the samples at or below it."""
+        if not self.total:
+            return None
+        threshold = self.total * q / 100
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= threshold:
+                return value
+        return max(self.counts)
+
+    def summary(self, percentiles=(5, 50, 95, 99)):
+        if not self.total:
+            return {"count": 0}
+        result = {"count": self.total, "mean": round(self.mean(), 3), "min": min(self.counts), "max": max(self.counts)}
+        for q in percentiles:
+            result[f"p{q}"] = self.percentile(q)
+        return result
+
+    def histogram(self):
+        return dict(sorted(self.counts.items()))
+
+
+def draw_delays(compiled, rng, disruption_types=DISRUPTION_TYPES):
+    """Draws one disruption scenario: a delay in minutes for every schedule entry."""
+    _, delays = draw_disruptions(len(compiled), rng, disruption_types)
+    return delays
+
+
+def _init_worker(network_model, compiled, start_time, duration):
+    _WORKER.update(network=network_model, compiled=compiled, start_time=start_time, duration=duration)
+
+
+def _run_scenarios(seed, scenario_ids):
+    """Runs a batch of scenarios in a worker and returns partial statistics."""
+    network, compiled = _WORKER['network'], _WORKER['compiled']
+    duration = _WORKER['duration']
+    stats = {"total_delay": StreamingHistogram(), "conflicts": StreamingHistogram()}
+    utilisation = {segment['id']: StreamingHistogram() for segment in network['segments']}
+
+    for scenario in scenario_ids:
+        rng = np.random.default_rng((seed, scenario))
+        delays = draw_delays(compiled, rng)
+        sim = TrainSimulator(network, None, compiled=compiled.with_delays(delays), sink=NullSink(), metrics=True)
+        sim.initialize(start_time_str=_WORKER['start_time'])
+        metrics = sim.run_event_driven(duration_mins=duration)
+
+        stats["total_delay"].add(int(delays.sum()))
+        stats["conflicts"].add(sum(metrics.conflicts.values()))
+        for segment_id, minutes in metrics.occupied_minutes.items():
+            # Utilisation is binned to whole percent of the horizon
+            utilisation[segment_id].add(round(100 * minutes / duration))
+    return stats, utilisation
+
+
+def run_ensemble(simulation_filepath, start_time, duration, scenarios, seed=0, workers=None, batch_size=50):
+    """
+    Runs `scenarios` seeded disruption scenarios of the simulation file across a
+    process pool and returns aggregated delay, conflict and utilisation statistics.
+    """
+    print(f"Loading simulation data from '{simulation_filepath}'...")
+    try:
+        with open(simulation_filepath, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error loading simulation file: {e}")
+        return None
+
+    network = data['network_model']
+    compiled = compile_schedule(network, data['train_schedule'])
+    workers = workers or os.cpu_count()
+    batches = [range(first, min(first + batch_size, scenarios)) for first in range(0, scenarios, batch_size)]
+
+    print(f"Running {scenarios} scenarios on {workers} workers...")
+    started = time.perf_counter()
+    totals = {"total_delay": StreamingHistogram(), "conflicts": StreamingHistogram()}
+    utilisation = {segment['id']: StreamingHistogram() for segment in network['segments']}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(network, compiled, start_time, duration)) as pool:
+        for stats, segment_stats in pool.map(_run_scenarios, [seed] * len(batches), batches):
+            for name, histogram in stats.items():
+                totals[name].merge(histogram)
+            for segment_id, histogram in segment_stats.items():
+                utilisation[segment_id].merge(histogram)
+
+    elapsed = time.perf_counter() - started
+    print(f"Ensemble complete in {elapsed:.2f}s ({scenarios / elapsed:.0f} scenarios/s).")
+    return {
+        "scenarios": scenarios,
+        "seed": seed,
+        "total_delay_mins": totals["total_delay"].summary(),
+        "conflicts": totals["conflicts"].summary(),
+        "conflicts_histogram": totals["conflicts"].histogram(),
+        "segment_utilisation_pct": {segment_id: histogram.summary() for segment_id, histogram in utilisation.items()},
+    }
+
+
+if __name__ == '__main__':
+    simulation_file = 'bpl_et_common_trains.json'
+    result = run_ensemble(simulation_file, start_time="00:00", duration=1440, scenarios=1000, seed=42)
+    if result:
+        print(json.dumps(result, indent=4))
@@ -0,0 +1,137 @@
+import json
+from collections import deque, namedtuple
+
+from compiled_schedule import format_minutes
+
+# Verbosity levels. A sink receives every event at or below its level.
+SILENT, SUMMARY, EVENTS, TRACE = 0, 1, 2, 3
+
+# Event kinds and the verbosity level at which each is emitted
+INITIALIZED, RUN_STARTED, RUN_COMPLETE = "INITIALIZED", "RUN_STARTED", "RUN_COMPLETE"
+DEPARTED, ARRIVED, CONFLICT = "DEPARTED", "ARRIVED", "CONFLICT"
+TICK = "TICK"
+EVENT_LEVELS = {
+    INITIALIZED: SUMMARY, RUN_STARTED: SUMMARY, RUN_COMPLETE: SUMMARY,
+    DEPARTED: EVENTS, ARRIVED: EVENTS, CONFLICT: EVENTS,
+    TICK: TRACE,
+}
+
+# A typed simulation event. `time` is in minutes since midnight of the day the
+# run started, so it keeps increasing past midnight on long runs.
+SimEvent = namedtuple(
+    'SimEvent',
+    ['time', 'kind', 'train_no', 'train_name', 'station_id', 'segment_id', 'other_train', 'detail'],
+    defaults=(None, None, None, None, None, None),
+)
+
+
+class EventSink:
+    """Base class for event sinks. Subclasses override emit()."""
+    level = EVENTS
+
+    def emit(self, event):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(EventSink):
+    """Discards everything. Its SILENT level stops the engine from even building events."""
+    level = SILENT
+
+    def emit(self, event):
+        pass
+
+
+class RingBufferSink(EventSink):
+    """Keeps the most recent `capacity` events in memory."""
+
+    def __init__(self, capacity=10_000, level=EVENTS):
+        self.level = level
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class NDJSONSink(EventSink):
+    """Writes one JSON object per event to a file, in batches of `batch_size` lines."""
+
+    def __init__(self, output_filepath, level=EVENTS, batch_size=5_000):
+        self.level = level
+        self.batch_size = batch_size
+        self.buffer = []
+        self.file = open(output_filepath, 'w')
+
+    def emit(self, event):
+        record = {field: value for field, value in event._asdict().items() if value is not None}
+        self.buffer.append(json.dumps(record))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class MultiSink(EventSink):
+    """Forwards every event to several sinks, each up to its own level."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.level = max(sink.level for sink in sinks)
+
+    def emit(self, event):
+        level = EVENT_LEVELS.get(event.kind, TRACE)
+        for sink in self.sinks:
+            if sink.level >= level:
+                sink.emit(event)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class ConsoleSink(EventSink):
+    """Prints events as the human-readable lines the simulator has always shown."""
+
+    def __init__(self, level=TRACE):
+        self.level = level
+
+    def emit(self, event):
+        print(format_event(event))
+
+
+def format_event(event):
+    """Formats an event as a console line."""
+    kind = event.kind
+    if kind == TICK:
+        return f"\n[Time: {format_minutes(event.time)}]"
+    if kind == DEPARTED:
+        return f"  EVENT: Train {event.train_no} ({event.train_name}) DEPARTED from {event.station_id} onto {event.segment_id}."
+    if kind == ARRIVED:
+        return f"  EVENT: Train {event.train_no} ({event.train_name}) ARRIVED at {event.station_id}, freeing segment {event.segment_id}."
+    if kind == CONFLICT:
+        return f"  CONFLICT: Train {event.train_no} cannot depart. Segment {event.segment_id} is occupied by Train {event.other_train}."
+    if kind == INITIALIZED:
+        return f"--- Simulation Initialized. Start Time: {event.detail} ---"
+    if kind == RUN_STARTED:
+        engine = "Event-Driven Simulation" if event.detail['engine'] == 'event' else "Simulation"
+        return f"--- Running {engine} for {event.detail['duration_mins']} minutes until {format_minutes(event.time + event.detail['duration_mins'])} ---"
+    if kind == RUN_COMPLETE:
+        return "\n--- Simulation Complete ---"
+    return f"  {kind}: {event}"
@@ -0,0 +1,262 @@
+import heapq
+import json
+import time
+from collections import Counter
+
+from compiled_schedule import ARRIVAL, DEPARTURE, HALT, NO_TIME, TrainState, compile_schedule
+from dispatch import DispatchQueues, TrackOccupancy
+from event_sinks import (ARRIVED, CONFLICT, DEPARTED, EVENTS, INITIALIZED, RUN_COMPLETE, RUN_STARTED, SUMMARY,
+                         NullSink, SimEvent)
+from metrics import SimulationMetrics
+
+MINUTES_PER_DAY = 1440
+
+
+class TrainRun:
+    """One run of a schedule entry on one day, with its steps' absolute times."""
+    __slots__ = ("index", "day", "times", "state", "delay")
+
+    def __init__(self, index, day, times, state):
+        self.index = index
+        self.day = day
+        self.times = times
+        self.state = state
+        self.delay = 0
+
+
+class HorizonSimulator:
+    """
+    Simulates a schedule on an absolute timeline of minutes from midnight of
+    day 0, over horizons of any number of days.
+
+    Every schedule entry may carry a 'day' offset, and with repeat_days=N the
+    whole timetable runs on each of N consecutive days. Each (entry, day) run
+    is a separate train that follows its full path, halts included. Times that
+    go backwards within a path roll over to the next day, so overnight and
+    multi-day trains need no special handling.
+
+    Runs are streamed in by start time: only those starting within
+    `window_mins` of the clock are loaded, and a run is retired as soon as it
+    reaches the end of its path. A blocked train is held at its station in
+    the dispatch priority queues until its segment track frees; tracks follow
+    the segment type and capacity rules of conflicts.py.
+
+    On a congested timetable held runs can pile up faster than they leave,
+    so at most `max_active` runs are loaded at once. Runs due while the
+    limit is reached wait outside the section and start late, counted in
+    `deferred`, so memory stays bounded however long the horizon and no
+    train is dropped. As an explicit policy, `max_hold_mins` cancels runs
+    held longer than that instead; they are counted in `cancelled` and
+    reported at the end of each run.
+    """
+
+    def __init__(self, network_model, compiled, sink=None, metrics=False, repeat_days=1, window_mins=180,
+                 max_active=1000, max_hold_mins=None):
+        self.network = network_model
+        self.compiled = compiled
+        self.sink = sink if sink is not None else NullSink()
+        self.repeat_days = repeat_days
+        self.window_mins = window_mins
+        self.max_active = max_active
+        self.max_hold_mins = max_hold_mins
+        self.clock = None
+        self.tracks = TrackOccupancy(network_model)
+        self.metrics = SimulationMetrics([segment['id'] for segment in network_model['segments']]) if metrics else None
+        self.dispatch = DispatchQueues()
+        # Active runs by load sequence number, and (clock, phase, sequence) events
+        self.runs = {}
+        self.pending = []
+        self.loaded = 0
+        self.retired = 0
+        self.deferred = 0
+        self.peak_active = 0
+        # Held runs by (clock they give up, sequence, path index, queue, entry),
+        # and the runs cancelled that way per Train_No
+        self.hold_expiry = []
+        self.cancelled = 0
+        self.cancelled_trains = Counter()
+        self._source = self._runs_by_start()
+        self._next_run = next(self._source, None)
+
+    def _runs_by_start(self):
+        """Yields (start clock, index, day) for every run, in order of start."""
+        compiled = self.compiled
+        starts = [(compiled.start_clock(index), index) for index in range(len(compiled))]
+        daily = sorted((start, index) for start, index in starts if start != NO_TIME)
+
+        def on_day(day):
+            return ((start + day * MINUTES_PER_DAY, index, day) for start, index in daily)
+        return heapq.merge(*(on_day(day) for day in range(self.repeat_days)))
+
+    def initialize(self, start_time_str="00:00", start_day=0):
+        """Sets the clock; runs that started before it are skipped."""
+        hours, minutes = start_time_str.split(':')
+        self.clock = start_day * MINUTES_PER_DAY + int(hours) * 60 + int(minutes)
+        while self._next_run is not None and self._next_run[0] < self.clock:
+            self._next_run = next(self._source, None)
+        if self.sink.level >= SUMMARY:
+            self.sink.emit(SimEvent(self.clock, INITIALIZED, detail=start_time_str))
+
+    def _load_until(self, clock):
+        """Loads every run starting before `clock` plus the look-ahead window."""
+        horizon = clock + self.window_mins
+        compiled = self.compiled
+        while self._next_run is not None and self._next_run[0] < horizon:
+            if self.max_active is not None and len(self.runs) >= self.max_active:
+                break
+            start, index, day = self._next_run
+            first = compiled.path_start[index]
+            if compiled.step_type[first] == DEPARTURE:
+                sequence = self.loaded
+                state = TrainState(compiled.ref_id(first), "SCHEDULED", 0)
+                run = self.runs[sequence] = TrainRun(index, day, compiled.absolute_times(index, day), state)
+                if start < self.clock:
+                    # Kept out by max_active, so it starts late
+                    run.delay = self.clock - start
+                    self.deferred += 1
+                heapq.heappush(self.pending, (start + run.delay, 0, sequence))
+                self.loaded += 1
+            self._next_run = next(self._source, None)
+        self.peak_active = max(self.peak_active, len(self.runs))
+
+    def run(self, duration_mins):
+        """Runs the horizon for `duration_mins` minutes. Returns the metrics, if enabled."""
+        sink = self.sink
+        if sink.level >= SUMMARY:
+            sink.emit(SimEvent(self.clock, RUN_STARTED, detail={"engine": "event", "duration_mins": duration_mins}))
+        if self.metrics is not None:
+            self.metrics.start(self.clock)
+
+        end_clock = self.clock + duration_mins
+        cancelled = self.cancelled
+        self._load_until(self.clock)
+        while True:
+            if self._next_run is not None and (not self.pending or self._next_run[0] <= self.pending[0][0]):
+                self._load_until(self.pending[0][0] if self.pending else self._next_run[0])
+            if not self.pending or self.pending[0][0] >= end_clock:
+                break
+            due, phase, sequence = heapq.heappop(self.pending)
+            self._cancel_held(due)
+            self.clock = due
+            run = self.runs[sequence]
+            if phase == 0:
+                self._depart(sequence, run, due)
+            else:
+                self._arrive(sequence, run)
+
+        self._cancel_held(end_clock)
+        self.clock = end_clock
+        if self.cancelled > cancelled:
+            print(f"Warning: {self.cancelled - cancelled} runs were cancelled after being held more than "
+                  f"{self.max_hold_mins} mins.")
+        if self.metrics is not None:
+            self.metrics.finish(self.clock)
+        if sink.level >= SUMMARY:
+            sink.emit(SimEvent(self.clock, RUN_COMPLETE))
+        sink.flush()
+        return self.metrics
+
+    def _depart(self, sequence, run, due):
+        compiled = self.compiled
+        state = run.state
+        train_no = compiled.train_nos[run.index]
+        position = compiled.step(run.index, state.path_index)
+        station_id, segment_id = compiled.ref_id(position), compiled.ref_id(position + 1)
+
+        track = self.tracks.track(segment_id, station_id)
+        occupant = self.tracks.blocker(track)
+        if occupant is not None:
+            if self.metrics is not None:
+                self.metrics.record_conflict(train_no, segment_id, self.clock)
+            if self.sink.level >= EVENTS:
+                self.sink.emit(SimEvent(self.clock, CONFLICT, train_no, compiled.train_names[run.index], station_id,
+                                        segment_id, compiled.train_nos[self.runs[occupant].index]))
+            entry = (compiled.priorities[run.index], due, sequence, 0)
+            self.dispatch.hold(station_id, segment_id, *entry)
+            if self.max_hold_mins is not None:
+                heapq.heappush(self.hold_expiry, (due + self.max_hold_mins, sequence, state.path_index,
+                                                  station_id, segment_id, entry))
+            return
+
+        # Time spent held carries over to the rest of the run
+        run.delay += self.clock - due
+        self.tracks.enter(track, sequence)
+        state.status, state.location, state.path_index = "EN_ROUTE", segment_id, state.path_index + 1
+        if self.metrics is not None:
+            self.metrics.record_departure(train_no, segment_id, self.clock)
+        if self.sink.level >= EVENTS:
+            self.sink.emit(SimEvent(self.clock, DEPARTED, train_no, compiled.train_names[run.index], station_id, segment_id))
+        arrival = state.path_index + 1
+        if compiled.step_type[compiled.step(run.index, arrival)] == ARRIVAL:
+            heapq.heappush(self.pending, (run.times[arrival] + run.delay, 1, sequence))
+
+    def _arrive(self, sequence, run):
+        compiled = self.compiled
+        state = run.state
+        train_no = compiled.train_nos[run.index]
+        state.path_index += 1
+        station_id, segment_id = compiled.ref_id(compiled.step(run.index, state.path_index)), state.location
+        freed = self.tracks.leave(segment_id, sequence)
+        state.status, state.location = "ARRIVED", station_id
+        if self.metrics is not None:
+            self.metrics.record_arrival(train_no, segment_id, self.clock)
+        if self.sink.level >= EVENTS:
+            self.sink.emit(SimEvent(self.clock, ARRIVED, train_no, compiled.train_names[run.index], station_id, segment_id))
+
+        # Halt, then carry on along the path, or retire at its end
+        next_index = state.path_index + 1
+        length = compiled.path_length(run.index)
+        while next_index < length and compiled.step_type[compiled.step(run.index, next_index)] == HALT:
+            next_index += 1
+        if next_index < length and compiled.step_type[compiled.step(run.index, next_index)] == DEPARTURE:
+            state.status, state.path_index = "SCHEDULED", next_index
+            heapq.heappush(self.pending, (max(run.times[next_index] + run.delay, self.clock), 0, sequence))
+        else:
+            del self.runs[sequence]
+            self.retired += 1
+
+        if freed is not None:
+            self._release(freed)
+
+    def _cancel_held(self, clock):
+        """Cancels every run still held for its departure after waiting past `clock`."""
+        expiry = self.hold_expiry
+        while expiry and expiry[0][0] < clock:
+            _, sequence, path_index, station_id, segment_id, entry = heapq.heappop(expiry)
+            run = self.runs.get(sequence)
+            # A run that has moved on since was released in time
+            if run is None or run.state.status != "SCHEDULED" or run.state.path_index != path_index:
+                continue
+            self.dispatch.discard(station_id, segment_id, entry)
+            del self.runs[sequence]
+            self.cancelled += 1
+            self.cancelled_trains[self.compiled.train_nos[run.index]] += 1
+
+    def _release(self, track):
+        """Lets the best train held for a freed segment track depart now."""
+        def is_current(entry):
+            run = self.runs.get(entry[2])
+            return run is not None and run.state.status == "SCHEDULED"
+
+        entry = self.dispatch.release(track[0], self.tracks.departure_stations(track), is_current)
+        if entry is not None:
+            _, due, sequence, _ = entry
+            self._depart(sequence, self.runs[sequence], due)
+
+
+if __name__ == '__main__':
+    with open('bpl_et_common_trains.json', 'r') as f:
+        data = json.load(f)
+    compiled = compile_schedule(data['network_model'], data['train_schedule'])
+
+    # One day, a week and four weeks of the daily timetable: the runs loaded
+    # at once never pass max_active however long the horizon
+    for days in (1, 7, 28):
+        sim = HorizonSimulator(data['network_model'], compiled, metrics=True, repeat_days=days)
+        sim.initialize("00:00")
+        started = time.perf_counter()
+        metrics = sim.run(duration_mins=days * MINUTES_PER_DAY)
+        print(f"Simulated {days} days in {time.perf_counter() - started:.2f}s: {sim.loaded} of {days * len(compiled)} runs loaded, "
+              f"{sim.retired} retired, {sim.deferred} started late, at most {sim.peak_active} active at once, "
+              f"{len(sim.dispatch)} held at stations.")
+        print(f"  Departures: {sum(metrics.departures_per_hour.values())}, conflicts: {sum(metrics.conflicts.values())}")
@@ -1,141 +1,178 @@
+import os
+import sys
 import pandas as pd
+import numpy as np
 import json
 
-def create_section_schedule(bhopal_filepath, itarsi_filepath, network_model):
+from compiled_schedule import compile_schedule, save_compiled
+
+# The columnar reader/writer lives with the upstream stages in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar import read_records
+from schema import MINUTE_LABELS, apply_schema
+
+# Minutes a train is assumed to halt at each intermediate station
+INTERMEDIATE_HALT_MINS = 2
+
+# Journeys this short (in minutes) are treated as bad data and skipped
+MIN_TRAVEL_MINS = 10
+
+def corridor_layout(network_model):
+    """
+    Orders the stations of a network model by km_from_start and finds the
+    segment joining each consecutive pair. Returns (station_ids, km, segment_ids).
+    """
+    stations = sorted(network_model['stations'], key=lambda station: station['km_from_start'])
+    station_ids = [station['id'] for station in stations]
+    km = np.array([station['km_from_start'] for station in stations], dtype=float)
+
+    segments_by_ends = {}
+    for segment in network_model['segments']:
+        segments_by_ends[frozenset((segment['from'], segment['to']))] = segment['id']
+    segment_ids = []
+    for here, there in zip(station_ids, station_ids[1:]):
+        segment_id = segments_by_ends.get(frozenset((here, there)))
+        if segment_id is None:
+            raise ValueError(f"Network model has no segment between {here} and {there}.")
+        segment_ids.append(segment_id)
+    return station_ids, km, segment_ids
+
+def to_minutes(times):
+    """Parses a column of HH:MM strings into float minutes since midnight (NaN if invalid)."""
+    if pd.api.types.is_integer_dtype(times):
+        # Columnar station tables already hold minutes
+        return times.to_numpy(dtype=float, na_value=np.nan)
+    parsed = pd.to_datetime(times, format='%H:%M', errors='coerce')
+    return (parsed.dt.hour * 60 + parsed.dt.minute).to_numpy(dtype=float)
+
+def build_journeys(origin_df, destination_df, station_ids, km, segment_ids, direction):
     """
-    Reads clean JSON data, finds common trains, synthesizes intermediate stops,
-    and builds a detailed event path for each train suitable for simulation.
+    Joins the records of two stations on Train_No and builds the event paths of
+    every train that departs the first of `station_ids` and arrives at the last one.
+    """
+    merged = pd.merge(origin_df, destination_df, on='Train_No', suffixes=('_FROM', '_TO'))
+    print(f"  - Found {len(merged)} common train numbers.")
+
+    valid = merged.dropna(subset=['Scheduled_Departure_FROM', 'Scheduled_Arrival_TO'])
+    print(f"  - Of those, {len(valid)} have a valid schedule for a {direction} journey.")
+    return journeys_from_legs(valid, station_ids, km, segment_ids, direction)
+
+def journeys_from_legs(valid, station_ids, km, segment_ids, direction):
+    """
+    Builds the event paths of the trains in `valid`, one row per train with
+    Train_No, Train_Name_FROM, Scheduled_Departure_FROM, Scheduled_Arrival_TO
+    and optionally Priority_FROM, all running from the first of `station_ids`
+    to the last. Intermediate arrivals are interpolated from the distance along
+    the corridor for all trains in a single vectorized pass.
+    """
+    origin, destination = station_ids[0], station_ids[-1]
+    departure = to_minutes(valid['Scheduled_Departure_FROM'])
+    arrival = to_minutes(valid['Scheduled_Arrival_TO'])
+    travel = arrival - departure
+    travel[travel < 0] += 1440
+    keep = ~np.isnan(travel) & (travel > MIN_TRAVEL_MINS)
+
+    departure, arrival, travel = departure[keep], arrival[keep], travel[keep]
+    train_nos = valid['Train_No'].to_numpy()[keep]
+    train_names = valid['Train_Name_FROM'].to_numpy()[keep]
+    # Station records from prority.py carry a Priority the dispatcher uses
+    priorities = valid['Priority_FROM'].to_numpy()[keep] if 'Priority_FROM' in valid else None
+
+    # Share of the total journey covered on reaching each intermediate station,
+    # giving one column of arrival and departure times per intermediate station
+    fraction = np.abs(km[1:-1] - km[0]) / abs(km[-1] - km[0])
+    intermediate_arrival = departure[:, None] + travel[:, None] * fraction[None, :]
+    intermediate_departure = intermediate_arrival + INTERMEDIATE_HALT_MINS
+
+    def labels(minutes):
+        return MINUTE_LABELS[np.floor(minutes).astype(np.int64) % 1440]
+
+    departure_labels = labels(departure)
+    arrival_labels = labels(arrival)
+    intermediate_arrival_labels = labels(intermediate_arrival)
+    intermediate_departure_labels = labels(intermediate_departure)
+
+    journeys = []
+    for row in range(len(train_nos)):
+        path = [{"type": "DEPARTURE", "station_id": origin, "time": departure_labels[row]}]
+        for stop, station_id in enumerate(station_ids[1:-1]):
+            path += [
+                {"type": "TRAVERSE", "segment_id": segment_ids[stop]},
+                {"type": "ARRIVAL", "station_id": station_id, "time": intermediate_arrival_labels[row, stop]},
+                {"type": "HALT", "station_id": station_id, "duration_mins": INTERMEDIATE_HALT_MINS},
+                {"type": "DEPARTURE", "station_id": station_id, "time": intermediate_departure_labels[row, stop]},
+            ]
+        path += [
+            {"type": "TRAVERSE", "segment_id": segment_ids[-1]},
+            {"type": "ARRIVAL", "station_id": destination, "time": arrival_labels[row]},
+        ]
+        journey = {"Train_No": int(train_nos[row]), "Train_Name": train_names[row]}
+        if priorities is not None and not pd.isna(priorities[row]):
+            journey["Priority"] = int(priorities[row])
+        journey.update({"direction": direction, "path": path})
+        journeys.append(journey)
+    return journeys
+
+def build_section_schedule(first_station_df, last_station_df, network_model):
+    """
+    Builds the section schedule for a corridor with any number of stations from
+    the records of its two end stations. DOWN trains run from the station with
+    the lowest km_from_start to the one with the highest, UP trains the other way.
+    """
+    station_ids, km, segment_ids = corridor_layout(network_model)
+
+    print(f"\nStep 2: Finding common trains for {station_ids[0]} -> {station_ids[-1]} (DOWN)...")
+    section_schedule = build_journeys(first_station_df, last_station_df, station_ids, km, segment_ids, "DOWN")
+
+    print(f"\nStep 3: Finding common trains for {station_ids[-1]} -> {station_ids[0]} (UP)...")
+    section_schedule += build_journeys(last_station_df, first_station_df, station_ids[::-1], km[::-1], segment_ids[::-1], "UP")
+    return section_schedule
+
+def create_section_schedule(first_station_filepath, last_station_filepath, network_model):
+    """
+    Reads clean station data (JSON or columnar tables) for the two end stations
+    of a section, finds common trains, synthesizes intermediate stops, and
+    builds a detailed event path for each train suitable for simulation.
     """
     print("Step 1: Loading clean data from station files...")
     try:
-        with open(bhopal_filepath, 'r') as f:
-            bhopal_data = json.load(f)
-        with open(itarsi_filepath, 'r') as f:
-            itarsi_data = json.load(f)
-        print(f"  - Loaded {len(bhopal_data)} records from '{bhopal_filepath}'.")
-        print(f"  - Loaded {len(itarsi_data)} records from '{itarsi_filepath}'.")
+        first_station_df = read_records(first_station_filepath)
+        last_station_df = read_records(last_station_filepath)
+        print(f"  - Loaded {len(first_station_df)} records from '{first_station_filepath}'.")
+        print(f"  - Loaded {len(last_station_df)} records from '{last_station_filepath}'.")
     except FileNotFoundError as e:
         print(f"Error: Could not find a required data file. {e}")
         return []
 
-    bhopal_df = pd.DataFrame(bhopal_data)
-    itarsi_df = pd.DataFrame(itarsi_data)
-    section_schedule = []
-
     # --- Data Type Standardization ---
-    print("\nStep 1.5: Standardizing Train_No data type...")
-    for df in [bhopal_df, itarsi_df]:
-        df['Train_No'] = pd.to_numeric(df['Train_No'], errors='coerce')
-        df.dropna(subset=['Train_No'], inplace=True)
-        df['Train_No'] = df['Train_No'].astype(int)
+    print("\nStep 1.5: Converting station records to the shared schema...")
+    first_station_df = apply_schema(first_station_df).dropna(subset=['Train_No'])
+    last_station_df = apply_schema(last_station_df).dropna(subset=['Train_No'])
     print("  - Data types standardized.")
 
-    # --- Process trains traveling DOWN (from Bhopal to Itarsi) ---
-    print("\nStep 2: Finding common trains for Bhopal -> Itarsi (DOWN)...")
-    
-    # Corrected Logic: Merge on Train_No FIRST to find all common trains.
-    merged_down_trains = pd.merge(bhopal_df, itarsi_df, on='Train_No', suffixes=('_BPL', '_ET'))
-    print(f"  - Found {len(merged_down_trains)} common train numbers.")
-    
-    # THEN, filter for valid journeys (must have departure from BPL and arrival at ET)
-    valid_down_journeys = merged_down_trains.dropna(subset=['Scheduled_Departure_BPL', 'Scheduled_Arrival_ET'])
-    print(f"  - Of those, {len(valid_down_journeys)} have a valid schedule for a DOWN journey.")
-
-    for _, row in valid_down_journeys.iterrows():
-        bpl_departure_time = pd.to_datetime(row['Scheduled_Departure_BPL'], format='%H:%M', errors='coerce')
-        et_arrival_time = pd.to_datetime(row['Scheduled_Arrival_ET'], format='%H:%M', errors='coerce')
-
-        if pd.isna(bpl_departure_time) or pd.isna(et_arrival_time):
-            continue
-
-        total_travel_minutes = (et_arrival_time - bpl_departure_time).total_seconds() / 60
-        if total_travel_minutes < 0:
-            total_travel_minutes += 1440 
-
-        if total_travel_minutes <= 10:
-            continue
-            
-        bpl_to_hbd_dist, total_dist = 74, 92
-        hbd_arrival_minutes = total_travel_minutes * (bpl_to_hbd_dist / total_dist)
-        hbd_arrival_time = bpl_departure_time + pd.Timedelta(minutes=hbd_arrival_minutes)
-        hbd_departure_time = hbd_arrival_time + pd.Timedelta(minutes=2)
-
-        path = [
-            {"type": "DEPARTURE", "station_id": "BPL", "time": bpl_departure_time.strftime('%H:%M')},
-            {"type": "TRAVERSE", "segment_id": "SEG_BPL_HBD"},
-            {"type": "ARRIVAL", "station_id": "HBD", "time": hbd_arrival_time.strftime('%H:%M')},
-            {"type": "HALT", "station_id": "HBD", "duration_mins": 2},
-            {"type": "DEPARTURE", "station_id": "HBD", "time": hbd_departure_time.strftime('%H:%M')},
-            {"type": "TRAVERSE", "segment_id": "SEG_HBD_ET"},
-            {"type": "ARRIVAL", "station_id": "ET", "time": et_arrival_time.strftime('%H:%M')}
-        ]
-
-        train_entry = {"Train_No": int(row['Train_No']), "Train_Name": row['Train_Name_BPL'], "direction": "DOWN", "path": path}
-        section_schedule.append(train_entry)
-
-    # --- Process trains traveling UP (from Itarsi to Bhopal) ---
-    print("\nStep 3: Finding common trains for Itarsi -> Bhopal (UP)...")
-    merged_up_trains = pd.merge(itarsi_df, bhopal_df, on='Train_No', suffixes=('_ET', '_BPL'))
-    print(f"  - Found {len(merged_up_trains)} common train numbers.")
-    
-    valid_up_journeys = merged_up_trains.dropna(subset=['Scheduled_Departure_ET', 'Scheduled_Arrival_BPL'])
-    print(f"  - Of those, {len(valid_up_journeys)} have a valid schedule for an UP journey.")
-
-    for _, row in valid_up_journeys.iterrows():
-        et_departure_time = pd.to_datetime(row['Scheduled_Departure_ET'], format='%H:%M', errors='coerce')
-        bpl_arrival_time = pd.to_datetime(row['Scheduled_Arrival_BPL'], format='%H:%M', errors='coerce')
-
-        if pd.isna(et_departure_time) or pd.isna(bpl_arrival_time):
-            continue
-
-        total_travel_minutes = (bpl_arrival_time - et_departure_time).total_seconds() / 60
-        if total_travel_minutes < 0:
-            total_travel_minutes += 1440
-        
-        if total_travel_minutes <= 10:
-            continue
-
-        et_to_hbd_dist, total_dist = 18, 92
-        hbd_arrival_minutes = total_travel_minutes * (et_to_hbd_dist / total_dist)
-        hbd_arrival_time = et_departure_time + pd.Timedelta(minutes=hbd_arrival_minutes)
-        hbd_departure_time = hbd_arrival_time + pd.Timedelta(minutes=2)
-
-        path = [
-            {"type": "DEPARTURE", "station_id": "ET", "time": et_departure_time.strftime('%H:%M')},
-            {"type": "TRAVERSE", "segment_id": "SEG_HBD_ET"},
-            {"type": "ARRIVAL", "station_id": "HBD", "time": hbd_arrival_time.strftime('%H:%M')},
-            {"type": "HALT", "station_id": "HBD", "duration_mins": 2},
-            {"type": "DEPARTURE", "station_id": "HBD", "time": hbd_departure_time.strftime('%H:%M')},
-            {"type": "TRAVERSE", "segment_id": "SEG_BPL_HBD"},
-            {"type": "ARRIVAL", "station_id": "BPL", "time": bpl_arrival_time.strftime('%H:%M')}
-        ]
-
-        train_entry = {"Train_No": int(row['Train_No']), "Train_Name": row['Train_Name_ET'], "direction": "UP", "path": path}
-        section_schedule.append(train_entry)
-        
-    return section_schedule
-
-def main():
-    # Define the physical network model for the section
-    network_model = {
-      "section_name": "Bhopal (BPL) to Itarsi (ET) - Major Stations",
-      "stations": [
-        {"id": "BPL", "name": "Bhopal Junction", "km_from_start": 0},
-        {"id": "HBD", "name": "Hoshangabad", "km_from_start": 74},
-        {"id": "ET", "name": "Itarsi Junction", "km_from_start": 92}
-      ],
-      "segments": [
-        {"id": "SEG_BPL_HBD", "from": "BPL", "to": "HBD", "distance_km": 74, "type": "double"},
-        {"id": "SEG_HBD_ET", "from": "HBD", "to": "ET", "distance_km": 18, "type": "double"}
-      ]
-    }
-    
+    return build_section_schedule(first_station_df, last_station_df, network_model)
+
+# The physical network model for the Bhopal - Itarsi section
+NETWORK_MODEL = {
+  "section_name": "Bhopal (BPL) to Itarsi (ET) - Major Stations",
+  "stations": [
+    {"id": "BPL", "name": "Bhopal Junction", "km_from_start": 0},
+    {"id": "HBD", "name": "Hoshangabad", "km_from_start": 74},
+    {"id": "ET", "name": "Itarsi Junction", "km_from_start": 92}
+  ],
+  "segments": [
+    {"id": "SEG_BPL_HBD", "from": "BPL", "to": "HBD", "distance_km": 74, "type": "double"},
+    {"id": "SEG_HBD_ET", "from": "HBD", "to": "ET", "distance_km": 18, "type": "double"}
+  ]
+}
+
+def map_section(first_station_filepath, last_station_filepath, output_filename, bundle_dir, network_model=NETWORK_MODEL):
+    """
+    Builds the section schedule from two station files and saves it both as a
+    simulation JSON file and as a compiled bundle.
+    """
     # Create the full section schedule by processing the two station files
-    synthesized_schedule = create_section_schedule(
-        'bhopal_data.json', 
-        'itarsri_data.json', # Corrected filename to match user's upload
-        network_model
-    )
+    synthesized_schedule = create_section_schedule(first_station_filepath, last_station_filepath, network_model)
 
     # Combine into the final simulation data package
     final_simulation_data = {
@@ -144,15 +181,24 @@ def main():
     }
 
     # Save the final mapped data to a new JSON file
-    output_filename = 'bpl_et_simulation_with_paths.json'
     with open(output_filename, 'w') as f:
         json.dump(final_simulation_data, f, indent=4)
+
+    # Also save the compiled paths as a bundle the simulator can memory-map
+    save_compiled(compile_schedule(network_model, synthesized_schedule), network_model, bundle_dir)
         
-    print(f"\nStep 4: Mapping complete! The synthesized simulation data with event paths has been saved to '{output_filename}'.")
+    print(f"\nStep 4: Mapping complete! The synthesized simulation data with event paths has been saved to '{output_filename}' and '{bundle_dir}'.")
     if not synthesized_schedule:
         print("\nWARNING: The final train schedule is still empty. Please check your JSON files for matching Train_No values with valid departure/arrival times.")
 
+def main():
+    map_section(
+        'bhopal_data.json',
+        'itarsi_data.json',
+        'bpl_et_simulation_with_paths.json',
+        'bpl_et_simulation_with_paths.cols'
+    )
+
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,108 @@
+import json
+from collections import Counter, defaultdict
+
+from compiled_schedule import format_minutes
+
+
+def hour_label(hour):
+    """Label for an hour counted from midnight of the start day, e.g. '18:00' or '02:00 (+1d)'."""
+    label = format_minutes(hour * 60)
+    return f"{label} (+{hour // 24}d)" if hour >= 24 else label
+
+
+class SimulationMetrics:
+    """
+    Counters and histograms collected by a TrainSimulator run:
+
+    - segment occupancy: total occupied minutes per segment and a histogram of
+      completed occupancy durations
+    - conflicts per segment
+    - waiting delay per train: minutes between a train's first blocked
+      departure and the moment it finally departs (or the end of the run)
+    - throughput: departures and arrivals per clock hour
+    - wall-clock seconds spent in each engine phase
+    """
+
+    def __init__(self, segment_ids):
+        self.start_clock = None
+        self.end_clock = None
+        self.occupied_minutes = dict.fromkeys(segment_ids, 0)
+        self.occupancy_durations = {segment_id: Counter() for segment_id in segment_ids}
+        self.conflicts = dict.fromkeys(segment_ids, 0)
+        self.waiting = {}
+        self.departures_per_hour = Counter()
+        self.arrivals_per_hour = Counter()
+        self.phase_seconds = defaultdict(float)
+        self._occupied_since = {}
+        self._blocked_since = {}
+
+    def start(self, clock):
+        if self.start_clock is None:
+            self.start_clock = clock
+
+    def record_departure(self, train_no, segment_id, clock):
+        self._occupied_since[segment_id] = clock
+        self.departures_per_hour[clock // 60] += 1
+        blocked_since = self._blocked_since.pop(train_no, None)
+        if blocked_since is not None:
+            self.waiting[train_no] = self.waiting.get(train_no, 0) + clock - blocked_since
+
+    def record_conflict(self, train_no, segment_id, clock):
+        self.conflicts[segment_id] = self.conflicts.get(segment_id, 0) + 1
+        self._blocked_since.setdefault(train_no, clock)
+
+    def record_arrival(self, train_no, segment_id, clock):
+        self.arrivals_per_hour[clock // 60] += 1
+        since = self._occupied_since.pop(segment_id, None)
+        if since is not None:
+            self.occupied_minutes[segment_id] = self.occupied_minutes.get(segment_id, 0) + clock - since
+            self.occupancy_durations.setdefault(segment_id, Counter())[clock - since] += 1
+
+    def finish(self, clock):
+        """Closes the run: open occupancies and waits are counted up to `clock`."""
+        self.end_clock = clock
+        for segment_id, since in self._occupied_since.items():
+            self.occupied_minutes[segment_id] += clock - since
+        for train_no, since in self._blocked_since.items():
+            self.waiting[train_no] = self.waiting.get(train_no, 0) + clock - since
+        self._occupied_since = {}
+        self._blocked_since = {}
+
+    @property
+    def duration_mins(self):
+        if self.start_clock is None or self.end_clock is None:
+            return 0
+        return self.end_clock - self.start_clock
+
+    def utilisation(self):
+        """Share of the run each segment spent occupied, from 0 to 1."""
+        duration = self.duration_mins
+        return {segment_id: (minutes / duration if duration else 0.0) for segment_id, minutes in self.occupied_minutes.items()}
+
+    def to_dict(self):
+        """Plain, JSON-serialisable view of every metric."""
+        waits = Counter(self.waiting.values())
+        return {
+            "start": self.start_clock,
+            "end": self.end_clock,
+            "duration_mins": self.duration_mins,
+            "segments": {
+                segment_id: {
+                    "occupied_minutes": self.occupied_minutes[segment_id],
+                    "utilisation": round(utilisation, 4),
+                    "conflicts": self.conflicts.get(segment_id, 0),
+                    "occupancy_histogram": dict(sorted(self.occupancy_durations[segment_id].items())),
+                }
+                for segment_id, utilisation in self.utilisation().items()
+            },
+            "total_conflicts": sum(self.conflicts.values()),
+            "waiting_mins_by_train": {str(train_no): minutes for train_no, minutes in self.waiting.items()},
+            "waiting_histogram": dict(sorted(waits.items())),
+            "departures_per_hour": {hour_label(hour): count for hour, count in sorted(self.departures_per_hour.items())},
+            "arrivals_per_hour": {hour_label(hour): count for hour, count in sorted(self.arrivals_per_hour.items())},
+            "phase_seconds": {phase: round(seconds, 6) for phase, seconds in self.phase_seconds.items()},
+        }
+
+    def export_json(self, output_filepath):
+        with open(output_filepath, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import time
+
+from compiled_schedule import format_minutes
+from event_sinks import EVENTS, RUN_COMPLETE, RUN_STARTED, EventSink
+from simulation import TrainSimulator
+
+
+class PublishingSink(EventSink):
+    """Forwards simulation events to a RealtimeService's subscribers."""
+
+    def __init__(self, service, level=EVENTS):
+        self.service = service
+        self.level = level
+
+    def emit(self, event):
+        # Every advance of the clock is a run of its own; those are not news
+        if event.kind not in (RUN_STARTED, RUN_COMPLETE):
+            self.service.publish({"kind": event.kind, **{field: value for field, value in event._asdict().items()
+                                                          if value is not None and field != "kind"}})
+
+
+class RealtimeService:
+    """
+    Keeps a TrainSimulator running against the wall clock, `speed` simulated
+    minutes per real minute, while delay updates stream in.
+
+    An update is a dict such as {"train_no": 12854, "delay_mins": 15} with an
+    optional "reason". It is applied with delay_train(), which reschedules only
+    that train's future events, and the train's revised next event is published
+    straight away. Simulation events are published as they happen. Subscribers
+    each get an asyncio.Queue of plain dicts.
+    """
+
+    def __init__(self, network_model, train_schedule, compiled=None, speed=1.0, tick_seconds=0.05):
+        self.speed = speed
+        self.tick_seconds = tick_seconds
+        self.subscribers = []
+        self.latencies = []
+        self.sim = TrainSimulator(network_model, train_schedule, compiled=compiled, sink=PublishingSink(self), dispatch=True)
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.remove(queue)
+
+    def publish(self, message):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+    def start(self, start_time_str):
+        self.sim.initialize(start_time_str=start_time_str)
+        self.sim.run_event_driven(duration_mins=0)
+        self._started_clock = self.sim.clock
+        self._started_wall = time.monotonic()
+
+    def target_clock(self):
+        """The simulation clock the wall clock has reached."""
+        elapsed_mins = (time.monotonic() - self._started_wall) / 60
+        return self._started_clock + int(elapsed_mins * self.speed)
+
+    def advance(self):
+        """Runs the simulation up to the wall clock."""
+        target = self.target_clock()
+        if target > self.sim.clock:
+            self.sim.run_event_driven(duration_mins=target - self.sim.clock)
+
+    def next_event(self, train_no):
+        """Projected (kind, station_id, clock) of a train's next event, HELD included, or None."""
+        projected = self.sim.next_event(train_no)
+        return projected[:3] if projected else None
+
+    def apply_update(self, update):
+        """Applies one delay update and publishes the train's revised projection."""
+        received = time.perf_counter()
+        self.advance()
+        train_no = int(update["train_no"])
+        if train_no not in self.sim.train_states:
+            self.publish({"kind": "UPDATE_REJECTED", "train_no": train_no, "reason": "unknown train"})
+            return
+        self.sim.delay_train(train_no, int(update.get("delay_mins", 0)))
+        projected = self.next_event(train_no)
+        latency = time.perf_counter() - received
+        self.latencies.append(latency)
+        message = {
+            "kind": "UPDATE", "time": self.sim.clock, "train_no": train_no,
+            "delay_mins": self.sim.delays.get(train_no, 0), "reason": update.get("reason"),
+            "latency_ms": round(latency * 1000, 3),
+        }
+        if projected:
+            message["next_event"] = {"type": projected[0], "station_id": projected[1], "time": format_minutes(projected[2])}
+        self.publish(message)
+
+    async def run_clock(self, duration_mins):
+        """Advances the simulation with the wall clock until `duration_mins` have passed."""
+        end_clock = self._started_clock + duration_mins
+        while self.sim.clock < end_clock:
+            await asyncio.sleep(self.tick_seconds)
+            self.advance()
+        self.publish({"kind": "CLOSED", "time": self.sim.clock})
+
+    async def consume(self, feed):
+        """Applies every update from an async iterator of update dicts."""
+        async for update in feed:
+            try:
+                self.apply_update(update)
+            except (KeyError, TypeError, ValueError) as e:
+                self.publish({"kind": "UPDATE_REJECTED", "update": update, "reason": str(e)})
+
+
+async def stub_feed(updates, interval_seconds=0.5):
+    """Yields canned updates at a steady pace, for trying the service out."""
+    for update in updates:
+        await asyncio.sleep(interval_seconds)
+        yield update
+
+
+async def tail_feed(filepath, poll_seconds=0.1):
+    """Yields one update per JSON line appended to `filepath`, like `tail -f`."""
+    while not os.path.exists(filepath):
+        await asyncio.sleep(poll_seconds)
+    with open(filepath, 'r') as f:
+        f.seek(0, os.SEEK_END)
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_seconds)
+                continue
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping bad update line: {e}")
+
+
+async def serve_updates(service, host='127.0.0.1', port=8765):
+    """Accepts updates as JSON lines from local socket clients."""
+    async def handle(reader, writer):
+        async def lines():
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    # A bad line is rejected; the connection stays open
+                    service.publish({"kind": "UPDATE_REJECTED", "reason": f"bad update line: {e}"})
+        try:
+            await service.consume(lines())
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def main():
+    with open('bpl_et_common_trains.json', 'r') as f:
+        data = json.load(f)
+
+    # Ten simulated minutes per real second
+    service = RealtimeService(data['network_model'], data['train_schedule'], speed=600)
+    subscriber = service.subscribe()
+    service.start("16:00")
+
+    updates = [
+        {"train_no": 12854, "delay_mins": 15, "reason": "Signal Fault Ahead"},
+        {"train_no": 11272, "delay_mins": 40, "reason": "Engine Failure"},
+        {"train_no": 12854, "delay_mins": 5, "reason": "Platform Congestion"},
+    ]
+
+    async def printer():
+        while (message := await subscriber.get())["kind"] != "CLOSED":
+            if message["kind"] == "UPDATE":
+                print(f"  UPDATE {message['train_no']}: now {message['delay_mins']} mins late, "
+                      f"next {message.get('next_event')} ({message['latency_ms']} ms)")
+
+    await asyncio.gather(service.run_clock(duration_mins=60), service.consume(stub_feed(updates)), printer())
+    print(f"Applied {len(service.latencies)} updates, slowest in {max(service.latencies) * 1000:.3f} ms.")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
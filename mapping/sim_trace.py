@@ -0,0 +1,297 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from event_sinks import ARRIVED, CONFLICT, DEPARTED, EVENTS, EventSink, SimEvent
+
+# Traces follow the conventions of the columnar tables in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar import FORMAT_NAME, FORMAT_VERSION, NULL, read_meta
+
+TRACE_KIND = "simulation_trace"
+
+# One raw little-endian file per column, appended to in batches
+TRACE_COLUMNS = {
+    "time": "<i4",
+    "kind": "<i1",
+    "train_no": "<i4",
+    "station": "<i2",
+    "segment": "<i2",
+    "other_train": "<i4",
+}
+
+# State transitions kept in a trace, by code
+TRACE_KINDS = [DEPARTED, ARRIVED, CONFLICT]
+KIND_CODES = {kind: code for code, kind in enumerate(TRACE_KINDS)}
+
+# End of an occupancy that was still open when the trace stopped
+OPEN_END = np.iinfo(np.int32).max
+
+
+def _read_meta(trace_dir):
+    return read_meta(trace_dir, kind=TRACE_KIND)
+
+
+class TraceSink(EventSink):
+    """
+    Writes the DEPARTED, ARRIVED and CONFLICT events of a run to an
+    append-only columnar trace directory: one raw file per column, extended in
+    batches of `batch_size` events, plus a meta.json holding the station and
+    segment dictionaries. close() also writes the per-train and per-segment
+    indexes SimulationTrace uses. With append=True an existing trace is
+    extended, e.g. by a run continued later; times must not go backwards.
+    """
+
+    def __init__(self, output_dir, level=EVENTS, batch_size=10_000, append=False):
+        self.level = level
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        os.makedirs(output_dir, exist_ok=True)
+        if append and os.path.exists(os.path.join(output_dir, 'meta.json')):
+            meta = _read_meta(output_dir)
+            self.rows, self.stations, self.segments = meta["rows"], meta["stations"], meta["segments"]
+        else:
+            self.rows, self.stations, self.segments = 0, [], []
+            for name in TRACE_COLUMNS:
+                open(os.path.join(output_dir, f"{name}.bin"), 'wb').close()
+        self.station_codes = {station_id: code for code, station_id in enumerate(self.stations)}
+        self.segment_codes = {segment_id: code for code, segment_id in enumerate(self.segments)}
+        self.buffer = {name: [] for name in TRACE_COLUMNS}
+        self._write_meta()
+
+    def _code(self, value, codes, values):
+        if value is None:
+            return NULL
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def emit(self, event):
+        kind = KIND_CODES.get(event.kind)
+        if kind is None:
+            return
+        buffer = self.buffer
+        buffer["time"].append(event.time)
+        buffer["kind"].append(kind)
+        buffer["train_no"].append(event.train_no)
+        buffer["station"].append(self._code(event.station_id, self.station_codes, self.stations))
+        buffer["segment"].append(self._code(event.segment_id, self.segment_codes, self.segments))
+        buffer["other_train"].append(NULL if event.other_train is None else event.other_train)
+        if len(buffer["time"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        count = len(self.buffer["time"])
+        if not count:
+            return
+        for name, dtype in TRACE_COLUMNS.items():
+            with open(os.path.join(self.output_dir, f"{name}.bin"), 'ab') as f:
+                np.asarray(self.buffer[name], dtype=dtype).tofile(f)
+            self.buffer[name] = []
+        self.rows += count
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+        build_index(self.output_dir)
+
+    def _write_meta(self):
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "kind": TRACE_KIND,
+            "rows": self.rows,
+            "columns": TRACE_COLUMNS,
+            "event_kinds": TRACE_KINDS,
+            "stations": self.stations,
+            "segments": self.segments,
+        }
+        index_meta = os.path.join(self.output_dir, 'meta.json')
+        if os.path.exists(index_meta):
+            meta["indexed_rows"] = _read_meta(self.output_dir).get("indexed_rows")
+        with open(index_meta, 'w') as f:
+            json.dump(meta, f)
+
+
+def _load_columns(trace_dir, meta):
+    """Memory-maps every column of a trace (empty arrays for an empty trace)."""
+    columns = {}
+    for name, dtype in meta["columns"].items():
+        path = os.path.join(trace_dir, f"{name}.bin")
+        if meta["rows"]:
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(meta["rows"],))
+        else:
+            columns[name] = np.zeros(0, dtype=dtype)
+    return columns
+
+
+def _compute_index(columns):
+    """
+    Builds the query indexes of a trace:
+
+    - train_rows: row numbers grouped by train (in time order within a
+      train), with train_keys / train_starts marking where each train begins
+    - occupancy intervals per segment (segment, start, end, train), sorted by
+      segment then start, with segment_starts marking where each segment begins
+    """
+    train_no = np.asarray(columns["train_no"])
+    train_rows = np.argsort(train_no, kind='stable').astype(np.int64)
+    train_keys, train_starts = np.unique(train_no[train_rows], return_index=True)
+
+    # Pair each departure onto a segment with the same train's arrival off it
+    kind, time, segment = np.asarray(columns["kind"]), np.asarray(columns["time"]), np.asarray(columns["segment"])
+    moves = np.flatnonzero((kind == KIND_CODES[DEPARTED]) | (kind == KIND_CODES[ARRIVED]))
+    open_since = {}
+    intervals = []
+    for row in moves:
+        key = (int(segment[row]), int(train_no[row]))
+        if kind[row] == KIND_CODES[DEPARTED]:
+            open_since[key] = int(time[row])
+        elif key in open_since:
+            intervals.append((key[0], open_since.pop(key), int(time[row]), key[1]))
+    intervals += [(segment_code, start, OPEN_END, train) for (segment_code, train), start in open_since.items()]
+    intervals.sort()
+    occupancy = np.array(intervals, dtype=np.int64).reshape(-1, 4)
+    segment_keys, segment_starts = np.unique(occupancy[:, 0], return_index=True)
+
+    return {
+        "train_rows": train_rows,
+        "train_keys": train_keys.astype(np.int64),
+        "train_starts": train_starts.astype(np.int64),
+        "occupancy": occupancy,
+        "segment_keys": segment_keys.astype(np.int64),
+        "segment_starts": segment_starts.astype(np.int64),
+    }
+
+
+def build_index(trace_dir):
+    """Computes the indexes of a trace and saves them as .npy files next to it."""
+    meta = _read_meta(trace_dir)
+    columns = _load_columns(trace_dir, meta)
+    time = np.asarray(columns["time"])
+    if len(time) and np.any(time[1:] < time[:-1]):
+        raise ValueError(f"Trace '{trace_dir}' is not in time order.")
+    for name, values in _compute_index(columns).items():
+        np.save(os.path.join(trace_dir, f"index_{name}.npy"), values)
+    meta["indexed_rows"] = meta["rows"]
+    with open(os.path.join(trace_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+class SimulationTrace:
+    """
+    Read-only, memory-mapped view of a trace written by TraceSink, answering
+    time-travel queries without re-running the simulation. Every lookup is a
+    binary search on the time column or on the per-train and per-segment
+    indexes. Indexes saved by TraceSink.close() are memory-mapped too; a trace
+    that grew since then is indexed in memory on open.
+    """
+
+    def __init__(self, trace_dir):
+        self.meta = _read_meta(trace_dir)
+        self.columns = _load_columns(trace_dir, self.meta)
+        self.stations = self.meta["stations"]
+        self.segments = self.meta["segments"]
+        self.segment_codes = {segment_id: code for code, segment_id in enumerate(self.segments)}
+        if self.meta.get("indexed_rows") == self.meta["rows"]:
+            self.index = {name: np.load(os.path.join(trace_dir, f"index_{name}.npy"), mmap_mode='r')
+                          for name in ("train_rows", "train_keys", "train_starts", "occupancy",
+                                       "segment_keys", "segment_starts")}
+        else:
+            self.index = _compute_index(self.columns)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def event(self, row):
+        """Decodes one row of the trace as a SimEvent."""
+        columns = self.columns
+        station, segment, other = int(columns["station"][row]), int(columns["segment"][row]), int(columns["other_train"][row])
+        return SimEvent(
+            int(columns["time"][row]), TRACE_KINDS[columns["kind"][row]], int(columns["train_no"][row]),
+            station_id=None if station == NULL else self.stations[station],
+            segment_id=None if segment == NULL else self.segments[segment],
+            other_train=None if other == NULL else other,
+        )
+
+    def events_between(self, start, end):
+        """Row range [first, last) of the events with start <= time <= end."""
+        time = self.columns["time"]
+        return int(np.searchsorted(time, start, side='left')), int(np.searchsorted(time, end, side='right'))
+
+    def _train_rows(self, train_no):
+        index = self.index
+        position = int(np.searchsorted(index["train_keys"], train_no))
+        if position == len(index["train_keys"]) or index["train_keys"][position] != train_no:
+            return index["train_rows"][:0]
+        first = index["train_starts"][position]
+        last = index["train_starts"][position + 1] if position + 1 < len(index["train_starts"]) else len(index["train_rows"])
+        return index["train_rows"][first:last]
+
+    def history(self, train_no):
+        """Every traced event of one train, in time order."""
+        return [self.event(row) for row in self._train_rows(train_no)]
+
+    def where_is(self, train_no, clock):
+        """
+        Where a train was at `clock`: {"status", "station_id" or "segment_id",
+        "since"} from its last event at or before then, or None if it had not
+        done anything yet. A train blocked by a conflict is 'HELD' at its station.
+        """
+        rows = self._train_rows(train_no)
+        position = int(np.searchsorted(self.columns["time"][rows], clock, side='right')) - 1
+        if position < 0:
+            return None
+        event = self.event(rows[position])
+        if event.kind == DEPARTED:
+            return {"status": "EN_ROUTE", "segment_id": event.segment_id, "since": event.time}
+        if event.kind == ARRIVED:
+            return {"status": "ARRIVED", "station_id": event.station_id, "since": event.time}
+        return {"status": "HELD", "station_id": event.station_id, "since": event.time}
+
+    def occupants(self, segment_id, start, end):
+        """
+        Trains that occupied a segment at any time between start and end, as
+        (train_no, entered, left) tuples; left is None if the train was still
+        on the segment when the trace stopped.
+        """
+        index = self.index
+        code = self.segment_codes.get(segment_id)
+        position = int(np.searchsorted(index["segment_keys"], code)) if code is not None else 0
+        if code is None or position == len(index["segment_keys"]) or index["segment_keys"][position] != code:
+            return []
+        first = index["segment_starts"][position]
+        last = index["segment_starts"][position + 1] if position + 1 < len(index["segment_starts"]) else len(index["occupancy"])
+        intervals = index["occupancy"][first:last]
+        # Intervals are sorted by entry time, so only those entered by `end` can overlap
+        intervals = intervals[:np.searchsorted(intervals[:, 1], end, side='right')]
+        overlapping = intervals[intervals[:, 2] >= start]
+        return [(int(train), int(entered), None if left == OPEN_END else int(left))
+                for _, entered, left, train in overlapping]
+
+    def conflicts(self, start, end, segment_id=None):
+        """Every CONFLICT event between start and end, optionally on one segment only."""
+        first, last = self.events_between(start, end)
+        kind = np.asarray(self.columns["kind"][first:last])
+        mask = kind == KIND_CODES[CONFLICT]
+        if segment_id is not None:
+            mask &= np.asarray(self.columns["segment"][first:last]) == self.segment_codes.get(segment_id, NULL - 1)
+        return [self.event(first + row) for row in np.flatnonzero(mask)]
+
+
+if __name__ == '__main__':
+    from simulation import run_simulation
+    from compiled_schedule import format_minutes
+
+    run_simulation('bpl_et_common_trains.json', "00:00", 1440, event_driven=True, trace_dir='bpl_et_trace')
+    trace = SimulationTrace('bpl_et_trace')
+    print(f"\nTrace holds {len(trace)} events.")
+    print(f"  - Train 12854 at 16:30: {trace.where_is(12854, 16 * 60 + 30)}")
+    for train_no, entered, left in trace.occupants('SEG_HBD_ET', 17 * 60, 19 * 60):
+        print(f"  - SEG_HBD_ET 17:00-19:00: train {train_no} from {format_minutes(entered)}"
+              f" to {format_minutes(left) if left is not None else 'the end'}")
+    print(f"  - Conflicts 17:00-19:00: {len(trace.conflicts(17 * 60, 19 * 60))}")
@@ -1,100 +1,524 @@
+import copy
+import heapq
 import json
+import time
 from datetime import datetime, timedelta
 
+from compiled_schedule import ARRIVAL, DEPARTURE, HALT, TrainState, compile_schedule, is_compiled_bundle, load_compiled
+from dispatch import DispatchQueues, TrackOccupancy
+from event_sinks import (ARRIVED, CONFLICT, DEPARTED, EVENTS, INITIALIZED, RUN_COMPLETE, RUN_STARTED, SUMMARY,
+                         TICK, TRACE, ConsoleSink, MultiSink, NullSink, SimEvent)
+from metrics import SimulationMetrics
+
+MINUTES_PER_DAY = 1440
+
+class SimulationSnapshot:
+    """
+    A frozen copy of a TrainSimulator's state at one clock: train states as
+    plain tuples, segment occupancy, delays, the event-driven engine's pending
+    events and dispatch queues, and the metrics collected so far. The compiled
+    schedule is not part of it, so a snapshot is small and cheap to pickle.
+    """
+
+    def __init__(self, sim):
+        self.clock = sim.clock
+        self.train_states = {train_no: (state.location, state.status, state.path_index)
+                             for train_no, state in sim.train_states.items()}
+        self.track_occupants = sim.tracks.copy_occupants()
+        self.delays = dict(sim.delays)
+        # Heap items are tuples, so copying the list copies the heap
+        self.pending = list(sim.pending) if sim.pending is not None else None
+        self.versions = dict(sim.versions)
+        self.run_offsets = dict(sim.run_offsets)
+        self.entries_by_train = sim.entries_by_train
+        self.dispatch_queues = None
+        if sim.dispatch is not None:
+            self.dispatch_queues = {station_id: {segment_id: list(heap) for segment_id, heap in queues.items()}
+                                    for station_id, queues in sim.dispatch.queues.items()}
+        self.metrics = copy.deepcopy(sim.metrics)
+
+
 class TrainSimulator:
     """
     A simulation engine for train movements within a defined railway section.
+
+    The engines emit typed SimEvent records to an event sink instead of
+    printing. The default ConsoleSink prints the familiar text output; pass a
+    NullSink (or any sink with a lower level) to skip building events at all.
+
+    With metrics=True the engines also fill a SimulationMetrics object, which
+    run() returns. A profiler (anything with enable()/disable(), such as
+    cProfile.Profile) is switched on for the duration of each run.
+
+    With dispatch=True the event-driven engine holds blocked trains in
+    per-station priority queues (see dispatch.py) and lets the best one depart
+    as soon as its segment frees, carrying the wait into its later times.
+    Trains then also follow their full path, halting at intermediate stations
+    and departing again. Without it a blocked train retries at the same time
+    on the next day, and a train stops at its first arrival.
     """
-    def __init__(self, network_model, train_schedule):
+    def __init__(self, network_model, train_schedule, compiled=None, sink=None, metrics=False, profiler=None,
+                 dispatch=False):
         self.network = network_model
         self.schedule = train_schedule
-        self.current_time = None
+        # The engines run on the compiled, array-backed form of the schedule
+        self.compiled = compiled if compiled is not None else compile_schedule(network_model, train_schedule)
+        self.sink = sink if sink is not None else ConsoleSink()
+        # Minutes since midnight of the day the run started
+        self.clock = None
         self.train_states = {}
-        self.segment_occupancy = {segment['id']: None for segment in self.network['segments']}
+        # Under dispatch segments follow their type and capacity, as in conflicts.py
+        self.tracks = TrackOccupancy(self.network, by_type=dispatch)
+        self.metrics = SimulationMetrics([segment['id'] for segment in self.network['segments']]) if metrics else None
+        self.profiler = profiler
+        self.dispatch = DispatchQueues() if dispatch else None
+        # Minutes each train runs behind its timetable
+        self.delays = {}
+        # Event-driven engine state, built on its first run
+        self.pending = None
+        self.versions = {}
+        self.entries_by_train = {}
+        # Minutes added to each entry's timetable times to put its current run
+        # on the clock, fixed when its next event is first scheduled
+        self.run_offsets = {}
+        self.entry_times = {}
+
+    @property
+    def current_time(self):
+        """The simulation clock as a datetime (None before initialize)."""
+        if self.clock is None:
+            return None
+        return datetime(1900, 1, 1) + timedelta(minutes=self.clock)
 
     def initialize(self, start_time_str):
         """Sets up the initial state of the simulation."""
-        self.current_time = datetime.strptime(start_time_str, '%H:%M')
-        for train in self.schedule:
-            train_no = train['Train_No']
-            first_event = train['path'][0]
-            if first_event['type'] == 'DEPARTURE':
-                self.train_states[train_no] = {
-                    "location": first_event['station_id'],
-                    "status": "SCHEDULED",
-                    "path_index": 0
-                }
-        print(f"--- Simulation Initialized. Start Time: {start_time_str} ---")
+        start_time = datetime.strptime(start_time_str, '%H:%M')
+        self.clock = start_time.hour * 60 + start_time.minute
+        compiled = self.compiled
+        for index, train_no in enumerate(compiled.train_nos):
+            first_step = compiled.path_start[index]
+            if compiled.step_type[first_step] == DEPARTURE:
+                self.train_states[train_no] = TrainState(compiled.ref_id(first_step), "SCHEDULED", 0)
+        if self.sink.level >= SUMMARY:
+            self.sink.emit(SimEvent(self.clock, INITIALIZED, detail=start_time_str))
 
     def run(self, duration_mins):
-        """Runs the simulation for a specified duration."""
-        end_time = self.current_time + timedelta(minutes=duration_mins)
-        print(f"--- Running Simulation for {duration_mins} minutes until {end_time.strftime('%H:%M')} ---")
-
-        while self.current_time < end_time:
-            print(f"\n[Time: {self.current_time.strftime('%H:%M')}]")
-            self._process_departures()
-            self._process_arrivals()
-            self.current_time += timedelta(minutes=1)
+        """Runs the simulation for a specified duration. Returns the metrics, if enabled."""
+        if self.dispatch is not None or self.delays or any(self.compiled.days):
+            raise ValueError("Priority dispatch, train delays and day offsets need the event-driven engine.")
+        sink = self.sink
+        if sink.level >= SUMMARY:
+            sink.emit(SimEvent(self.clock, RUN_STARTED, detail={"engine": "tick", "duration_mins": duration_mins}))
+        self._start_instrumentation()
+
+        metrics = self.metrics
+        trace = sink.level >= TRACE
+        end_clock = self.clock + duration_mins
+        while self.clock < end_clock:
+            if trace:
+                sink.emit(SimEvent(self.clock, TICK))
+            minute_of_day = self.clock % MINUTES_PER_DAY
+            if metrics is None:
+                self._process_departures(minute_of_day)
+                self._process_arrivals(minute_of_day)
+            else:
+                started = time.perf_counter()
+                self._process_departures(minute_of_day)
+                between = time.perf_counter()
+                self._process_arrivals(minute_of_day)
+                metrics.phase_seconds["departures"] += between - started
+                metrics.phase_seconds["arrivals"] += time.perf_counter() - between
+            self.clock += 1
         
-        print("\n--- Simulation Complete ---")
+        return self._finish_run()
+
+    def _start_instrumentation(self):
+        if self.metrics is not None:
+            self.metrics.start(self.clock)
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def _finish_run(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.metrics is not None:
+            self.metrics.finish(self.clock)
+        if self.sink.level >= SUMMARY:
+            self.sink.emit(SimEvent(self.clock, RUN_COMPLETE))
+        self.sink.flush()
+        return self.metrics
+
+    def run_event_driven(self, duration_mins):
+        """
+        Runs the simulation by jumping from one scheduled event to the next
+        instead of ticking every minute. Produces the same events as run().
+        Pending events are kept between calls, so a run can be continued.
+        Returns the metrics, if enabled.
+        """
+        sink = self.sink
+        if sink.level >= SUMMARY:
+            sink.emit(SimEvent(self.clock, RUN_STARTED, detail={"engine": "event", "duration_mins": duration_mins}))
+        self._start_instrumentation()
+        metrics = self.metrics
+        loop_started = time.perf_counter()
+        handler_seconds = 0.0
+
+        compiled = self.compiled
+        if self.pending is None:
+            self._schedule_all()
+        heap = self.pending
+        versions = self.versions
+        end_clock = self.clock + duration_mins
+
+        trace = sink.level >= TRACE
+        last_traced = None
+        while heap and heap[0][0] < end_clock:
+            due, phase, index, version = heapq.heappop(heap)
+            train_no = compiled.train_nos[index]
+            if version != versions[train_no]:
+                continue
+
+            self.clock = due
+            if trace and due != last_traced:
+                sink.emit(SimEvent(self.clock, TICK))
+                last_traced = due
+
+            state = self.train_states[train_no]
+            if metrics is not None:
+                handler_started = time.perf_counter()
+            if phase == 0:
+                departed = self._depart(index, state)
+            else:
+                freed = self._arrive(index, state)
+                if self.dispatch is not None and freed is not None:
+                    self._release(freed)
+            if metrics is not None:
+                elapsed = time.perf_counter() - handler_started
+                metrics.phase_seconds["departures" if phase == 0 else "arrivals"] += elapsed
+                handler_seconds += elapsed
+
+            if phase == 0 and not departed:
+                if self.dispatch is not None:
+                    # Held at the station until the segment frees
+                    position = compiled.step(index, state.path_index)
+                    self.dispatch.hold(compiled.ref_id(position), compiled.ref_id(position + 1),
+                                       compiled.priorities[index], due, index, version)
+                else:
+                    # A blocked train keeps its slot and retries at the same
+                    # time on the next day, exactly like the tick engine.
+                    self.run_offsets[index] += MINUTES_PER_DAY
+                    heapq.heappush(heap, (due + MINUTES_PER_DAY, phase, index, version))
+                continue
+
+            self._moved(train_no, index)
+            self._schedule_train(train_no, due)
+
+        if metrics is not None:
+            # Everything in the loop that was not a departure or arrival handler
+            metrics.phase_seconds["dispatch"] += time.perf_counter() - loop_started - handler_seconds
+        self.clock = end_clock
+        return self._finish_run()
+
+    def _schedule_all(self):
+        """Builds the pending event heap of the event-driven engine from the current states."""
+        # Schedule entries that share a Train_No also share a single state,
+        # so a state change has to reschedule every entry of that train.
+        self.entries_by_train = {}
+        for index, train_no in enumerate(self.compiled.train_nos):
+            if train_no in self.train_states:
+                self.entries_by_train.setdefault(train_no, []).append(index)
+
+        # Heap items are (clock, phase, schedule index, version). Phase 0
+        # (departures) sorts before phase 1 (arrivals) within the same minute,
+        # and the schedule index keeps the tick engine's processing order.
+        self.pending = []
+        self.versions = dict.fromkeys(self.entries_by_train, 0)
+        self.run_offsets = {}
+        for train_no in self.entries_by_train:
+            self._schedule_train(train_no, self.clock)
+
+    def _schedule_train(self, train_no, now):
+        """Pushes the next event of every entry of `train_no`, due at or after clock `now`."""
+        compiled = self.compiled
+        state = self.train_states[train_no]
+        delay = self.delays.get(train_no, 0)
+        for index in self.entries_by_train[train_no]:
+            if state.status == "SCHEDULED":
+                phase, position = 0, compiled.step(index, state.path_index)
+                if compiled.step_type[position] != DEPARTURE:
+                    continue
+            elif state.status == "EN_ROUTE" and state.path_index + 1 < compiled.path_length(index):
+                phase, position = 1, compiled.step(index, state.path_index + 1)
+                if compiled.step_type[position] != ARRIVAL:
+                    continue
+            else:
+                continue
+            path_index = position - compiled.path_start[index]
+            offset = self.run_offsets.get(index)
+            if offset is None:
+                # The entry's first event: the next time its step comes round,
+                # on a later day for a run that starts with a day offset
+                due = now + (compiled.step_time[position] + delay - now) % MINUTES_PER_DAY
+                if path_index == 0:
+                    due += compiled.days[index] * MINUTES_PER_DAY
+                self.run_offsets[index] = due - delay - self._times(index)[path_index]
+            else:
+                # Later events keep to the same run, and a late train goes now
+                due = max(now, offset + self._times(index)[path_index] + delay)
+            heapq.heappush(self.pending, (due, phase, index, self.versions[train_no]))
 
-    def _process_departures(self):
+    def _times(self, index):
+        """Absolute timetable times of entry `index`, computed once."""
+        times = self.entry_times.get(index)
+        if times is None:
+            times = self.entry_times[index] = self.compiled.absolute_times(index)
+        return times
+
+    def _moved(self, train_no, index):
+        """
+        Invalidates a train's pending events after entry `index` moved it.
+        Other entries sharing its Train_No are no longer on a run of their own,
+        so their next event is placed afresh.
+        """
+        self.versions[train_no] += 1
+        for other in self.entries_by_train[train_no]:
+            if other != index:
+                self.run_offsets.pop(other, None)
+
+    def _held_departure(self, train_no):
+        """Planned clock of the departure a train is held for in the dispatch queues, or None."""
+        state = self.train_states[train_no]
+        if self.dispatch is None or state.status != "SCHEDULED":
+            return None
+        delay = self.delays.get(train_no, 0)
+        for index in self.entries_by_train.get(train_no, ()):
+            offset = self.run_offsets.get(index)
+            if offset is None or self.compiled.step_type[self.compiled.step(index, state.path_index)] != DEPARTURE:
+                continue
+            planned = offset + self._times(index)[state.path_index]
+            if planned + delay < self.clock:
+                return planned
+        return None
+
+    def _release(self, track):
+        """Lets the best train held for a freed segment track depart now."""
+        compiled = self.compiled
+        versions = self.versions
+
+        def is_current(entry):
+            train_no = compiled.train_nos[entry[2]]
+            return entry[3] == versions[train_no] and self.train_states[train_no].status == "SCHEDULED"
+
+        entry = self.dispatch.release(track[0], self.tracks.departure_stations(track), is_current)
+        if entry is None:
+            return
+        index = entry[2]
+        train_no = compiled.train_nos[index]
+        state = self.train_states[train_no]
+        # How late it finally leaves carries over to the rest of the journey
+        planned = self.run_offsets[index] + self._times(index)[state.path_index]
+        self.delays[train_no] = max(self.delays.get(train_no, 0), self.clock - planned)
+        self._depart(index, state)
+        self._moved(train_no, index)
+        self._schedule_train(train_no, self.clock)
+
+    def snapshot(self):
+        """Captures the full state of the simulation at the current clock."""
+        return SimulationSnapshot(self)
+
+    def restore(self, snapshot):
+        """Puts the simulation back into the state captured by `snapshot`."""
+        self.clock = snapshot.clock
+        self.train_states = {train_no: TrainState(*fields) for train_no, fields in snapshot.train_states.items()}
+        self.tracks.occupants = {track: list(occupants) for track, occupants in snapshot.track_occupants.items()}
+        self.delays = dict(snapshot.delays)
+        self.pending = list(snapshot.pending) if snapshot.pending is not None else None
+        self.versions = dict(snapshot.versions)
+        self.run_offsets = dict(snapshot.run_offsets)
+        # Only ever read once built, so it is shared rather than copied
+        self.entries_by_train = snapshot.entries_by_train
+        if snapshot.dispatch_queues is not None:
+            self.dispatch = DispatchQueues()
+            self.dispatch.queues = {station_id: {segment_id: list(heap) for segment_id, heap in queues.items()}
+                                    for station_id, queues in snapshot.dispatch_queues.items()}
+        if snapshot.metrics is not None:
+            self.metrics = copy.deepcopy(snapshot.metrics)
+
+    def fork(self, snapshot=None, sink=None, metrics=False):
+        """
+        Returns a new simulator that continues from `snapshot` (by default the
+        current state) and shares this one's compiled schedule. Forks are
+        silent unless given a sink. With metrics=True a fork whose snapshot has
+        no metrics starts collecting them from the snapshot's clock.
+        """
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        sim = TrainSimulator(self.network, self.schedule, compiled=self.compiled,
+                             sink=sink if sink is not None else NullSink(), metrics=metrics,
+                             dispatch=snapshot.dispatch_queues is not None)
+        sim.restore(snapshot)
+        return sim
+
+    def delay_train(self, train_no, minutes):
+        """
+        Delays every remaining event of a train by `minutes`. Only that train's
+        pending events are rescheduled, never earlier than the current clock;
+        knock-on conflicts are resolved as the run continues. A train held in
+        the dispatch queues stays there while it is still late for its new
+        time, and leaves the queue to wait for that time otherwise.
+        """
+        if train_no not in self.train_states:
+            return
+        held = self._held_departure(train_no) if self.pending is not None else None
+        self.delays[train_no] = self.delays.get(train_no, 0) + minutes
+        if self.pending is None or (held is not None and held + self.delays[train_no] <= self.clock):
+            return
+        self.versions[train_no] += 1
+        self._schedule_train(train_no, self.clock)
+
+    def next_event(self, train_no):
+        """
+        What a train does next, as (kind, station_id, clock, schedule index):
+        its earliest pending DEPARTURE or ARRIVAL, or HELD at a station since
+        the clock it was due to leave if it waits in the dispatch queues.
+        None if it has nothing left to do or the event-driven engine has not
+        run yet.
+        """
+        if self.pending is None or train_no not in self.versions:
+            return None
+        compiled = self.compiled
+        version = self.versions[train_no]
+        pending = [item for item in self.pending if item[3] == version and compiled.train_nos[item[2]] == train_no]
+        if pending:
+            due, phase, index, _ = min(pending)
+            position = compiled.step(index, self.train_states[train_no].path_index + phase)
+            return ("DEPARTURE" if phase == 0 else "ARRIVAL", compiled.ref_id(position), due, index)
+        if self.dispatch is not None and self.train_states[train_no].status == "SCHEDULED":
+            for station_id, _, (_, due, index, entry_version) in self.dispatch.held():
+                if entry_version == version and compiled.train_nos[index] == train_no:
+                    return ("HELD", station_id, due, index)
+        return None
+
+    def _depart(self, index, state):
+        """Moves a train onto its next segment, or reports a conflict. Returns True on departure."""
+        compiled = self.compiled
+        train_no = compiled.train_nos[index]
+        position = compiled.step(index, state.path_index)
+        segment_id = compiled.ref_id(position + 1)
+        track = self.tracks.track(segment_id, compiled.ref_id(position))
+        blocker = self.tracks.blocker(track)
+
+        if blocker is None:
+            self.tracks.enter(track, train_no)
+            state.status, state.location, state.path_index = "EN_ROUTE", segment_id, state.path_index + 1
+            if self.metrics is not None:
+                self.metrics.record_departure(train_no, segment_id, self.clock)
+            if self.sink.level >= EVENTS:
+                self.sink.emit(SimEvent(self.clock, DEPARTED, train_no, compiled.train_names[index],
+                                        compiled.ref_id(position), segment_id))
+            return True
+
+        if self.metrics is not None:
+            self.metrics.record_conflict(train_no, segment_id, self.clock)
+        if self.sink.level >= EVENTS:
+            self.sink.emit(SimEvent(self.clock, CONFLICT, train_no, compiled.train_names[index],
+                                    compiled.ref_id(position), segment_id, blocker))
+        return False
+
+    def _arrive(self, index, state):
+        """
+        Moves a train off its segment into the arrival station, freeing its
+        place on the segment. Returns the track it left.
+        """
+        compiled = self.compiled
+        train_no = compiled.train_nos[index]
+        station_id = compiled.ref_id(compiled.step(index, state.path_index + 1))
+        segment_to_free = state.location
+        freed = self.tracks.leave(segment_to_free, train_no)
+
+        state.status, state.location, state.path_index = "ARRIVED", station_id, state.path_index + 1
+        if self.metrics is not None:
+            self.metrics.record_arrival(train_no, segment_to_free, self.clock)
+        if self.sink.level >= EVENTS:
+            self.sink.emit(SimEvent(self.clock, ARRIVED, train_no, compiled.train_names[index], station_id, segment_to_free))
+
+        # Under dispatch the train halts, then waits for its next departure
+        if self.dispatch is not None:
+            next_index = state.path_index + 1
+            length = compiled.path_length(index)
+            while next_index < length and compiled.step_type[compiled.step(index, next_index)] == HALT:
+                next_index += 1
+            if next_index < length and compiled.step_type[compiled.step(index, next_index)] == DEPARTURE:
+                state.status, state.path_index = "SCHEDULED", next_index
+        return freed
+
+    def _process_departures(self, minute_of_day):
         """Processes scheduled train departures for the current time."""
-        for train in self.schedule:
-            train_no = train['Train_No']
+        compiled = self.compiled
+        for index, train_no in enumerate(compiled.train_nos):
             state = self.train_states.get(train_no)
-            if not state or state['status'] != "SCHEDULED": continue
-
-            current_event = train['path'][state['path_index']]
-            if current_event['type'] == 'DEPARTURE' and datetime.strptime(current_event['time'], '%H:%M').time() == self.current_time.time():
-                next_event = train['path'][state['path_index'] + 1]
-                segment_id = next_event['segment_id']
-                
-                if self.segment_occupancy[segment_id] is None:
-                    self.segment_occupancy[segment_id] = train_no
-                    state.update({"status": "EN_ROUTE", "location": segment_id, "path_index": state['path_index'] + 1})
-                    print(f"  EVENT: Train {train_no} ({train['Train_Name']}) DEPARTED from {current_event['station_id']} onto {segment_id}.")
-                else:
-                    occupying_train = self.segment_occupancy[segment_id]
-                    print(f"  CONFLICT: Train {train_no} cannot depart. Segment {segment_id} is occupied by Train {occupying_train}.")
+            if not state or state.status != "SCHEDULED": continue
+
+            position = compiled.path_start[index] + state.path_index
+            if compiled.step_type[position] == DEPARTURE and compiled.step_time[position] == minute_of_day:
+                self._depart(index, state)
 
-    def _process_arrivals(self):
+    def _process_arrivals(self, minute_of_day):
         """Processes train arrivals for the current time."""
-        for train in self.schedule:
-            train_no = train['Train_No']
+        compiled = self.compiled
+        for index, train_no in enumerate(compiled.train_nos):
             state = self.train_states.get(train_no)
-            if not state or state['status'] != "EN_ROUTE": continue
+            if not state or state.status != "EN_ROUTE": continue
 
-            arrival_event = train['path'][state['path_index'] + 1]
-            if arrival_event['type'] == 'ARRIVAL' and datetime.strptime(arrival_event['time'], '%H:%M').time() == self.current_time.time():
-                segment_to_free = state['location']
-                self.segment_occupancy[segment_to_free] = None
-                
-                # A real sim would handle the halt, for now we just mark as arrived at station
-                state.update({"status": "ARRIVED", "location": arrival_event['station_id'], "path_index": state['path_index'] + 1})
-                print(f"  EVENT: Train {train_no} ({train['Train_Name']}) ARRIVED at {arrival_event['station_id']}, freeing segment {segment_to_free}.")
+            position = compiled.path_start[index] + state.path_index + 1
+            if compiled.step_type[position] == ARRIVAL and compiled.step_time[position] == minute_of_day:
+                self._arrive(index, state)
 
 
-def run_simulation(simulation_filepath, start_time, duration):
-    """Loads a simulation file and runs the simulation."""
+def run_simulation(simulation_filepath, start_time, duration, event_driven=False, sink=None, metrics=False,
+                   trace_dir=None):
+    """
+    Loads a simulation file (JSON, or a bundle written by save_compiled) and
+    runs the simulation. Pass event_driven=True to use the priority-queue
+    engine instead of the 1-minute tick loop, and a sink to send the events
+    somewhere other than the console. With trace_dir set the run's state
+    transitions are also written to an indexed trace there (see sim_trace.py).
+    With metrics=True the run's SimulationMetrics are returned.
+    """
     print("\n--- STEP 2: RUNNING SIMULATION ---")
-    try:
-        with open(simulation_filepath, 'r') as f:
-            data = json.load(f)
-        network = data.get('network_model')
-        schedule = data.get('train_schedule')
-        if not network or schedule is None:
-            print("Error: Simulation file is missing 'network_model' or 'train_schedule'.")
+    compiled = None
+    if is_compiled_bundle(simulation_filepath):
+        # A compiled bundle is memory-mapped instead of parsed
+        network, compiled = load_compiled(simulation_filepath)
+        schedule = None
+    else:
+        try:
+            with open(simulation_filepath, 'r') as f:
+                data = json.load(f)
+            network = data.get('network_model')
+            schedule = data.get('train_schedule')
+            if not network or schedule is None:
+                print("Error: Simulation file is missing 'network_model' or 'train_schedule'.")
+                return
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error loading simulation file: {e}")
             return
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading simulation file: {e}")
-        return
 
-    if schedule:
-        sim = TrainSimulator(network, schedule)
+    if schedule or (compiled is not None and len(compiled)):
+        trace = None
+        if trace_dir is not None:
+            # Only a traced run pays for importing numpy
+            from sim_trace import TraceSink
+            trace = TraceSink(trace_dir)
+            sink = MultiSink(sink or ConsoleSink(), trace)
+        sim = TrainSimulator(network, schedule, compiled=compiled, sink=sink, metrics=metrics)
         sim.initialize(start_time_str=start_time)
-        sim.run(duration_mins=duration)
+        if event_driven:
+            result = sim.run_event_driven(duration_mins=duration)
+        else:
+            result = sim.run(duration_mins=duration)
+        if trace is not None:
+            trace.close()
+        return result
     else:
         print("Could not run simulation because the train schedule is empty.")
 
@@ -0,0 +1,185 @@
+import os
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+import pandas as pd
+
+from compiled_schedule import parse_minutes
+from maping import NETWORK_MODEL, corridor_layout, journeys_from_legs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar import read_records
+
+# One record of a train at a station; times are 'HH:MM' strings or minutes, None if missing
+StationStop = namedtuple('StationStop', ['train_name', 'priority', 'arrival', 'departure'])
+
+# One train that can run from station A to station B
+Leg = namedtuple('Leg', ['train_no', 'train_name', 'priority', 'departure', 'arrival'])
+
+# The station files of the Bhopal - Itarsi section
+STATION_FILES = {"BPL": 'bhopal_data.json', "ET": 'itarsi_data.json'}
+
+
+def _minutes(value):
+    if value is None or pd.isna(value):
+        return None
+    return int(value) if not isinstance(value, str) else parse_minutes(value)
+
+
+class StationIndex:
+    """
+    In-memory index over the records of many stations, built once:
+
+    - station -> {Train_No: [StationStop, ...]} in file order
+    - Train_No -> stations it calls at
+
+    Queries for trains running between any two stations are answered from
+    these hash maps instead of a DataFrame merge, and the most recent
+    `cache_size` station pairs are kept in an LRU cache.
+    """
+
+    def __init__(self, cache_size=1024):
+        self.stations = {}
+        self.trains = {}
+        self.trains_between = lru_cache(maxsize=cache_size)(self._trains_between)
+
+    @classmethod
+    def from_files(cls, station_files, cache_size=1024):
+        """Builds an index from {station_id: path} of station JSON files or columnar tables."""
+        index = cls(cache_size)
+        for station_id, filepath in station_files.items():
+            try:
+                index.add_station(station_id, read_records(filepath))
+            except FileNotFoundError as e:
+                print(f"Error: Could not find station file for {station_id}. {e}")
+        return index
+
+    @classmethod
+    def from_store(cls, store_dir, cache_size=1024):
+        """Builds an index from the consolidated schedule store written by batch.py."""
+        index = cls(cache_size)
+        store = read_records(store_dir)
+        for station_id, records in store.groupby('Station', observed=True, sort=False):
+            index.add_station(station_id, records)
+        return index
+
+    def add_station(self, station_id, records):
+        """Adds (or replaces) the records of one station, given as a DataFrame."""
+        train_nos = pd.to_numeric(records['Train_No'], errors='coerce')
+        priorities = records['Priority'] if 'Priority' in records else [None] * len(records)
+        by_train = {}
+        for train_no, name, priority, arrival, departure in zip(
+                train_nos, records['Train_Name'], priorities, records['Scheduled_Arrival'], records['Scheduled_Departure']):
+            if pd.isna(train_no):
+                continue
+            train_no = int(train_no)
+            arrival = None if pd.isna(arrival) else arrival
+            departure = None if pd.isna(departure) else departure
+            priority = None if priority is None or pd.isna(priority) else int(priority)
+            by_train.setdefault(train_no, []).append(StationStop(name, priority, arrival, departure))
+
+        for train_no in self.stations.get(station_id, {}):
+            self.trains[train_no].discard(station_id)
+        self.stations[station_id] = by_train
+        for train_no in by_train:
+            self.trains.setdefault(train_no, set()).add(station_id)
+        self.trains_between.cache_clear()
+
+    def trains_at(self, station_id):
+        """{Train_No: [StationStop, ...]} for every train calling at a station."""
+        return self.stations.get(station_id, {})
+
+    def stops(self, train_no):
+        """
+        The indexed stations a train calls at as (station_id, arrival, departure),
+        in running order. The order follows the times, starting from the stop
+        with no arrival (where the train starts) or else after the longest gap.
+        """
+        stops = []
+        for station_id in self.trains.get(train_no, ()):
+            records = self.stations[station_id][train_no]
+            arrival = next((stop.arrival for stop in records if stop.arrival is not None), None)
+            departure = next((stop.departure for stop in records if stop.departure is not None), None)
+            when = _minutes(arrival if arrival is not None else departure)
+            if when is not None:
+                stops.append((when, station_id, arrival, departure))
+        if not stops:
+            return []
+        stops.sort()
+
+        first = next((i for i, stop in enumerate(stops) if stop[2] is None), None)
+        if first is None:
+            gaps = [(stops[i][0] - stops[i - 1][0]) % 1440 for i in range(len(stops))]
+            first = max(range(len(stops)), key=gaps.__getitem__)
+        return [(station_id, arrival, departure) for _, station_id, arrival, departure in stops[first:] + stops[:first]]
+
+    def _trains_between(self, origin, destination):
+        """
+        Every (departure at origin, arrival at destination) pairing of the trains
+        calling at both stations, as a tuple of Legs, in the order a merge of
+        the two station files on Train_No would give.
+        """
+        at_origin, at_destination = self.stations.get(origin, {}), self.stations.get(destination, {})
+        common = [train_no for train_no in at_origin if train_no in at_destination]
+        legs = []
+        for train_no in common:
+            for start in at_origin[train_no]:
+                if start.departure is None:
+                    continue
+                for end in at_destination[train_no]:
+                    if end.arrival is not None:
+                        legs.append(Leg(train_no, start.train_name, start.priority, start.departure, end.arrival))
+        return tuple(legs)
+
+    def legs_frame(self, origin, destination):
+        """The legs from origin to destination in the column layout journeys_from_legs reads."""
+        legs = self.trains_between(origin, destination)
+        frame = pd.DataFrame({
+            "Train_No": [leg.train_no for leg in legs],
+            "Train_Name_FROM": [leg.train_name for leg in legs],
+            "Scheduled_Departure_FROM": [leg.departure for leg in legs],
+            "Scheduled_Arrival_TO": [leg.arrival for leg in legs],
+        })
+        if any(leg.priority is not None for leg in legs):
+            frame["Priority_FROM"] = [leg.priority for leg in legs]
+        return frame
+
+    def section_schedule(self, network_model):
+        """Builds the DOWN and UP section schedule between the two ends of a corridor."""
+        station_ids, km, segment_ids = corridor_layout(network_model)
+        down = self.legs_frame(station_ids[0], station_ids[-1])
+        up = self.legs_frame(station_ids[-1], station_ids[0])
+        return (journeys_from_legs(down, station_ids, km, segment_ids, "DOWN")
+                + journeys_from_legs(up, station_ids[::-1], km[::-1], segment_ids[::-1], "UP"))
+
+    def all_section_schedules(self, network_model):
+        """
+        Builds a section schedule for every pair of consecutive indexed stations
+        along the corridor, with any unindexed stations between them as
+        intermediate stops. Returns {(from_id, to_id): (network_model, schedule)}.
+        """
+        station_ids, _, segment_ids = corridor_layout(network_model)
+        stations = {station['id']: station for station in network_model['stations']}
+        segments = {segment['id']: segment for segment in network_model['segments']}
+        indexed = [position for position, station_id in enumerate(station_ids) if station_id in self.stations]
+
+        sections = {}
+        for first, last in zip(indexed, indexed[1:]):
+            section = {
+                "section_name": f"{station_ids[first]} to {station_ids[last]}",
+                "stations": [stations[station_id] for station_id in station_ids[first:last + 1]],
+                "segments": [segments[segment_id] for segment_id in segment_ids[first:last]],
+            }
+            sections[(station_ids[first], station_ids[last])] = (section, self.section_schedule(section))
+        return sections
+
+
+if __name__ == '__main__':
+    index = StationIndex.from_files(STATION_FILES)
+    print(f"Indexed {len(index.stations)} stations and {len(index.trains)} trains.")
+    print(f"  - BPL -> ET: {len(index.trains_between('BPL', 'ET'))} legs")
+    print(f"  - ET -> BPL: {len(index.trains_between('ET', 'BPL'))} legs")
+    print(f"  - Stops of 12854: {index.stops(12854)}")
+    for (origin, destination), (section, schedule) in index.all_section_schedules(NETWORK_MODEL).items():
+        print(f"  - Section {origin} - {destination}: {len(schedule)} trains")
@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compiled_schedule import compile_schedule
+from event_sinks import NullSink
+from simulation import TrainSimulator
+
+# Set once per worker process by _init_worker, so the network, the compiled
+# schedule and the snapshot are shipped to each worker a single time.
+_WORKER = {}
+
+
+def evaluate(sim, snapshot, holds, duration_mins):
+    """
+    Forks `sim` at `snapshot`, holds each train in `holds` ({train_no: minutes})
+    and runs the rest of the horizon with the event-driven engine. Only the
+    remaining minutes are simulated. Returns a small summary of the outcome.
+    """
+    fork = sim.fork(snapshot, metrics=True)
+    for train_no, minutes in holds.items():
+        fork.delay_train(train_no, minutes)
+    metrics = fork.run_event_driven(duration_mins=duration_mins)
+    return {
+        "holds": holds,
+        "conflicts": sum(metrics.conflicts.values()),
+        "waiting_mins": sum(metrics.waiting.values()),
+        "departures": sum(metrics.departures_per_hour.values()),
+        "arrivals": sum(metrics.arrivals_per_hour.values()),
+        "delay_mins": sum(fork.delays.values()),
+    }
+
+
+def _init_worker(network_model, compiled, snapshot, dispatch):
+    sim = TrainSimulator(network_model, None, compiled=compiled, sink=NullSink(), dispatch=dispatch)
+    _WORKER.update(sim=sim, snapshot=snapshot)
+
+
+def _evaluate_batch(batch, duration_mins):
+    return [evaluate(_WORKER['sim'], _WORKER['snapshot'], holds, duration_mins) for holds in batch]
+
+
+def run_what_ifs(sim, scenarios, duration_mins, workers=None, batch_size=20):
+    """
+    Evaluates every scenario in `scenarios` (a list of {train_no: minutes}
+    holds) from the current state of `sim`. With workers=1 the forks run in
+    this process; otherwise they are spread over a process pool.
+    Returns one summary per scenario, in order.
+    """
+    snapshot = sim.snapshot()
+    if workers == 1:
+        return [evaluate(sim, snapshot, holds, duration_mins) for holds in scenarios]
+
+    batches = [scenarios[first:first + batch_size] for first in range(0, len(scenarios), batch_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(sim.network, sim.compiled, snapshot, sim.dispatch is not None)) as pool:
+        for batch_results in pool.map(_evaluate_batch, batches, [duration_mins] * len(batches)):
+            results.extend(batch_results)
+    return results
+
+
+if __name__ == '__main__':
+    with open('bpl_et_common_trains.json', 'r') as f:
+        data = json.load(f)
+    network = data['network_model']
+    compiled = compile_schedule(network, data['train_schedule'])
+
+    # Run the day up to 17:20 once, then ask what holding each train would do
+    sim = TrainSimulator(network, None, compiled=compiled, sink=NullSink(), dispatch=True)
+    sim.initialize(start_time_str="00:00")
+    sim.run_event_driven(duration_mins=17 * 60 + 20)
+
+    scenarios = [{12854: 15}] + [{train_no: 15} for train_no in sorted(set(compiled.train_nos))[:50]]
+    started = time.perf_counter()
+    results = run_what_ifs(sim, scenarios, duration_mins=6 * 60 + 40, workers=1)
+    print(f"Evaluated {len(results)} what-if scenarios in {time.perf_counter() - started:.3f}s.")
+    for result in sorted(results, key=lambda result: -result["waiting_mins"])[:5]:
+        print(f"  Hold {result['holds']}: {result['conflicts']} conflicts, {result['waiting_mins']} mins waiting")
@@ -0,0 +1,228 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import disruptionsindata
+import jsonconv
+import prority
+import stream_clean
+
+# The mapping stage lives in its own directory next to its helper modules
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT_DIR, 'mapping'))
+import maping
+
+# Directories holding the repo's own modules, searched in import order
+SOURCE_DIRS = [ROOT_DIR, os.path.join(ROOT_DIR, 'mapping')]
+
+MANIFEST_FILE = '.pipeline_manifest.json'
+
+# Station directories and the file names used at every stage. A station
+# without a raw scrape starts from its cleaned CSV.
+STATIONS = [
+    {"name": "BPL", "dir": "."},
+    {"name": "ET", "dir": "Itarsi"},
+]
+RAW_FILE = 'etrain.csv'
+CLEANED_FILE = 'etrain_cleaned.csv'
+PRIORITY_FILE = 'etrain_with_priority.csv'
+FINAL_FILE = 'etrain_final.json'
+DISRUPTIONS_FILE = 'etrain_with_disruptions.json'
+
+class Stage:
+    """
+    One step of the pipeline: calls func(*inputs, *outputs, **params). A stage
+    depends on every other stage that produces one of its inputs.
+    """
+
+    def __init__(self, stage_id, func, inputs, outputs, params=None):
+        self.id = stage_id
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+
+    def fingerprint(self):
+        """
+        Hash of the stage's code, parameters and the content of every input.
+        Inputs are named relative to the repo, so a moved checkout keeps its
+        manifest.
+        The code is every repo module the stage function's module imports,
+        directly or not, so editing a shared helper invalidates the stage too.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.id.encode())
+        for path in local_sources(self.func.__module__):
+            digest.update(os.path.basename(path).encode())
+            digest.update(hash_path(path).encode())
+        digest.update(json.dumps(self.params, sort_keys=True).encode())
+        for path in self.inputs:
+            digest.update(os.path.relpath(path, ROOT_DIR).encode())
+            digest.update(hash_path(path).encode())
+        return digest.hexdigest()
+
+def source_path(module_name):
+    """File of a repo module, or None for the standard library and packages."""
+    for directory in SOURCE_DIRS:
+        path = os.path.join(directory, f"{module_name}.py")
+        if os.path.exists(path):
+            return path
+    return None
+
+def local_sources(module_name):
+    """Files of a repo module and of every repo module it imports, transitively."""
+    paths = {}
+    todo = [module_name]
+    while todo:
+        name = todo.pop()
+        path = source_path(name)
+        if name in paths or path is None:
+            continue
+        paths[name] = path
+        with open(path, 'r') as f:
+            tree = ast.parse(f.read())
+        # Imports inside functions count too, e.g. deferred ones
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module)
+    return [paths[name] for name in sorted(paths)]
+
+def hash_path(path):
+    """Content hash of a file, or of every file in a directory."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            digest.update(name.encode())
+            digest.update(hash_path(os.path.join(path, name)).encode())
+    elif os.path.exists(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def modified_time(path):
+    """Latest modification time of a file or of any file in a directory, or None if missing."""
+    if os.path.isdir(path):
+        times = [modified_time(os.path.join(path, name)) for name in os.listdir(path)]
+        return max([os.stat(path).st_mtime_ns] + [t for t in times if t is not None])
+    if os.path.exists(path):
+        return os.stat(path).st_mtime_ns
+    return None
+
+def station_stages(station, root_dir=ROOT_DIR, seed=0):
+    """Builds the clean -> priority -> JSON -> disruptions chain of one station directory."""
+    def path(name):
+        return os.path.normpath(os.path.join(root_dir, station["dir"], name))
+
+    stages = []
+    if os.path.exists(path(RAW_FILE)):
+        stages.append(Stage(f"{station['name']}:clean", stream_clean.clean_scraped_data,
+                            [path(RAW_FILE)], [path(CLEANED_FILE)]))
+    stages += [
+        Stage(f"{station['name']}:priority", prority.prioritize_data, [path(CLEANED_FILE)], [path(PRIORITY_FILE)]),
+        Stage(f"{station['name']}:json", jsonconv.convert_csv_to_json, [path(PRIORITY_FILE)], [path(FINAL_FILE)]),
+        Stage(f"{station['name']}:disruptions", disruptionsindata.inject_disruptions,
+              [path(FINAL_FILE)], [path(DISRUPTIONS_FILE)], {"seed": seed}),
+    ]
+    return stages
+
+def build_pipeline(stations=STATIONS, root_dir=ROOT_DIR, seed=0):
+    """Returns every stage of the pipeline: one chain per station plus the mapping step."""
+    stages = []
+    for station in stations:
+        stages += station_stages(station, root_dir, seed)
+
+    finals = {station["name"]: os.path.normpath(os.path.join(root_dir, station["dir"], FINAL_FILE)) for station in stations}
+    mapping_dir = os.path.join(root_dir, 'mapping')
+    stages.append(Stage("mapping:section", maping.map_section,
+                        [finals["BPL"], finals["ET"]],
+                        [os.path.join(mapping_dir, 'bpl_et_simulation_with_paths.json'),
+                         os.path.join(mapping_dir, 'bpl_et_simulation_with_paths.cols')]))
+    return stages
+
+def _run_stage(stage):
+    started = time.perf_counter()
+    stage.func(*stage.inputs, *stage.outputs, **stage.params)
+    return time.perf_counter() - started
+
+def run_pipeline(stages, manifest_path=os.path.join(ROOT_DIR, MANIFEST_FILE), workers=None, force=False):
+    """
+    Runs the stages in dependency order, running independent stages in
+    parallel. A stage whose fingerprint matches the manifest and whose outputs
+    all exist is skipped. A stage that runs is only recorded once every one of
+    its outputs has been rewritten, since the stage functions print their
+    errors instead of raising. Returns the time spent per stage (None if skipped).
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    producers = {output: stage.id for stage in stages for output in stage.outputs}
+    upstream = {stage.id: {producers[i] for i in stage.inputs if i in producers} for stage in stages}
+    pending = {stage.id: stage for stage in stages}
+    done, failed, timings = set(), set(), {}
+    running = {}
+
+    print(f"Running pipeline with {len(stages)} stages...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for stage_id, stage in list(pending.items()):
+                if upstream[stage_id] & failed:
+                    print(f"  [{stage_id}] skipped, an upstream stage failed.")
+                    failed.add(stage_id)
+                    del pending[stage_id]
+                elif upstream[stage_id] <= done:
+                    del pending[stage_id]
+                    fingerprint = stage.fingerprint()
+                    if not force and manifest.get(stage_id) == fingerprint and all(os.path.exists(o) for o in stage.outputs):
+                        print(f"  [{stage_id}] up to date, skipped.")
+                        timings[stage_id] = None
+                        done.add(stage_id)
+                    else:
+                        before = [modified_time(o) for o in stage.outputs]
+                        running[pool.submit(_run_stage, stage)] = (stage, fingerprint, before)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint, before = running.pop(future)
+                try:
+                    timings[stage.id] = future.result()
+                except Exception as e:
+                    print(f"  [{stage.id}] failed: {e}")
+                    failed.add(stage.id)
+                    continue
+                after = [modified_time(o) for o in stage.outputs]
+                if any(a is None or a == b for a, b in zip(after, before)):
+                    print(f"  [{stage.id}] failed: it did not rewrite all of its outputs.")
+                    failed.add(stage.id)
+                    continue
+                manifest[stage.id] = fingerprint
+                done.add(stage.id)
+                print(f"  [{stage.id}] done in {timings[stage.id]:.3f}s.")
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    print("\nPipeline summary:")
+    for stage in stages:
+        if stage.id in failed:
+            status = "FAILED"
+        elif timings.get(stage.id) is None:
+            status = "cached"
+        else:
+            status = f"{timings[stage.id]:.3f}s"
+        print(f"  {stage.id:<20} {status}")
+    return timings
+
+if __name__ == '__main__':
+    run_pipeline(build_pipeline())
@@ -1,56 +1,106 @@
+import json
+import re
+import numpy as np
 import pandas as pd
 
-def assign_priority(row):
+from schema import INT_COLUMNS, apply_schema, nullable, to_text
+
+# Priority rules, checked in order; the first matching rule wins. A lower
+# number means a higher priority. A rule matches when the upper-cased train
+# name contains any of its keywords or the train number starts with any of
+# its prefixes. The same structure can be loaded from a JSON file, so new
+# categories can be added without code changes.
+PRIORITY_RULES = {
+    "default_priority": 5,  # Any other train type (e.g., Passenger)
+    "rules": [
+        {"category": "Premium", "priority": 1,
+         "keywords": ["RAJDHANI", "SHATABDI", "DURONTO", "VANDE BHARAT", "TEJAS", "GATIMAAN"]},
+        {"category": "Superfast", "priority": 2, "keywords": ["SF"], "prefixes": ["12", "20", "22"]},
+        {"category": "Mail/Express", "priority": 3, "keywords": ["MAIL", "EXPRESS", "EXP"]},
+        # Adding specific special train numbers from data
+        {"category": "Special", "priority": 4, "keywords": ["SPL"], "prefixes": ["0", "7", "1667"]},
+    ],
+}
+
+def load_priority_rules(rules_filepath):
+    """Loads priority rules from a JSON file with the same structure as PRIORITY_RULES."""
+    with open(rules_filepath, 'r') as f:
+        return json.load(f)
+
+class PriorityClassifier:
     """
-    Assigns a priority level to a train based on its type.
-    A lower number means a higher priority.
+    Assigns priorities to whole columns of trains at once. Keyword lists are
+    compiled once into a single regex per rule, and each distinct train is
+    classified only once no matter how many station rows it appears in.
     """
-    train_name = str(row['Train_Name']).upper()
-    train_no = str(row['Train_No'])
 
-    # Priority 1: Premium Trains (Highest)
-    premium_keywords = ['RAJDHANI', 'SHATABDI', 'DURONTO', 'VANDE BHARAT', 'TEJAS', 'GATIMAAN']
-    if any(keyword in train_name for keyword in premium_keywords):
-        return 1
+    def __init__(self, rules=PRIORITY_RULES):
+        self.default_priority = rules.get("default_priority", 5)
+        self.rules = []
+        for rule in rules["rules"]:
+            keywords = rule.get("keywords", [])
+            pattern = '|'.join(re.escape(keyword.upper()) for keyword in keywords) if keywords else None
+            self.rules.append((rule["priority"], pattern, tuple(rule.get("prefixes", []))))
 
-    # Priority 2: Superfast Trains (SF)
-    if 'SF' in train_name or train_no.startswith(('12', '20', '22')):
-        return 2
+    def classify(self, train_nos, train_names):
+        """Returns an array with the priority of every (Train_No, Train_Name) pair."""
+        # Missing values can never match a rule, so they become empty strings
+        numbers = pd.Series(train_nos).astype(str).fillna('').reset_index(drop=True)
+        names = pd.Series(train_names).astype(str).fillna('').str.upper().reset_index(drop=True)
 
-    # Priority 3: Mail/Express Trains
-    if 'MAIL' in train_name or 'EXPRESS' in train_name or 'EXP' in train_name:
-        return 3
+        # Classify each distinct train once, then broadcast back to every row
+        codes, uniques = pd.factorize(numbers + '\x00' + names)
+        first_rows = pd.Series(codes).drop_duplicates().index
+        unique_numbers = numbers.iloc[first_rows].reset_index(drop=True)
+        unique_names = names.iloc[first_rows].reset_index(drop=True)
 
-    # Priority 4: Special Trains (SPL)
-    if 'SPL' in train_name or train_no.startswith(('0', '7', '1667')): # Adding specific special train numbers from data
-        return 4
+        masks = []
+        for _, pattern, prefixes in self.rules:
+            mask = np.zeros(len(uniques), dtype=bool)
+            if pattern:
+                mask |= unique_names.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            if prefixes:
+                mask |= unique_numbers.str.startswith(prefixes).to_numpy(dtype=bool)
+            masks.append(mask)
 
-    # Priority 5: Default for any other train type (e.g., Passenger)
-    return 5
+        priorities = np.select(masks, [priority for priority, _, _ in self.rules], default=self.default_priority)
+        return priorities[codes]
 
-def prioritize_data(input_filepath, output_filepath):
+def assign_priority(row, classifier=None):
+    """
+    Assigns a priority level to a single train based on its type.
+    A lower number means a higher priority.
+    """
+    classifier = classifier or PriorityClassifier()
+    return int(classifier.classify([row['Train_No']], [row['Train_Name']])[0])
+
+def prioritize_data(input_filepath, output_filepath, rules_filepath=None):
     """
     Reads the cleaned train data, adds a priority column, and saves the result.
+    Rules come from PRIORITY_RULES unless a JSON rules file is given.
     """
     print(f"Reading data from '{input_filepath}' to add priorities...")
     try:
-        df = pd.read_csv(input_filepath)
+        df = apply_schema(pd.read_csv(input_filepath))
     except FileNotFoundError:
         print(f"Error: The file '{input_filepath}' was not found. Please run the cleaning script first.")
         return
 
-    # Apply the priority assignment function to each row
-    df['Priority'] = df.apply(assign_priority, axis=1)
+    rules = load_priority_rules(rules_filepath) if rules_filepath else PRIORITY_RULES
+    classifier = PriorityClassifier(rules)
+
+    # Classify all rows in one vectorized pass
+    df['Priority'] = nullable(classifier.classify(df['Train_No'], df['Train_Name']).astype(INT_COLUMNS['Priority']))
 
     # Reorder columns to place Priority after Train_Name for readability
     cols = ['Train_No', 'Train_Name', 'Priority', 'From_Station', 'To_Station', 'Scheduled_Arrival', 'Scheduled_Departure']
     df = df[cols]
 
     # Save the updated DataFrame to a new CSV file
-    df.to_csv(output_filepath, index=False)
+    to_text(df).to_csv(output_filepath, index=False)
     print(f"Successfully added priority column. Data saved to '{output_filepath}'.")
 
 if __name__ == '__main__':
     cleaned_file = 'etrain_cleaned.csv'
     prioritized_file = 'etrain_with_priority.csv'
-    prioritize_data(cleaned_file, prioritized_file)
\ No newline at end of file
+    prioritize_data(cleaned_file, prioritized_file)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# The typed schema every stage loads its station records into:
+#
+#   Train_No                      Int32, fixed width whatever the input held
+#   Priority                      Int8
+#   Delay_Mins                    Int16
+#   Scheduled_/Actual_ times      Int16 minutes since midnight
+#   station, name and type text   category
+#
+# Integer columns are pandas nullable arrays whose values hold NULL where the
+# data is missing, which is also how they are stored on disk by columnar.py.
+# The CSV and JSON files between stages keep their text form; to_text() and
+# to_records() turn a typed frame back into it.
+
+# Null sentinel for every integer-coded column
+NULL = -1
+
+# Columns holding HH:MM strings, stored as int16 minutes since midnight
+TIME_COLUMNS = ['Scheduled_Arrival', 'Scheduled_Departure', 'Actual_Arrival', 'Actual_Departure']
+
+# Integer columns with a fixed storage type
+INT_COLUMNS = {'Train_No': 'int32', 'Priority': 'int8', 'Delay_Mins': 'int16'}
+
+# Text columns whose values repeat across rows
+CATEGORY_COLUMNS = ['Train_Name', 'From_Station', 'To_Station', 'Station', 'Disruption_Type']
+
+# Every HH:MM label of the day, indexed by minute, so formatting is a lookup
+MINUTE_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)], dtype=object)
+
+def encode_minutes(times):
+    """Encodes a column of HH:MM strings as int16 minutes, NULL where missing or invalid."""
+    if pd.api.types.is_integer_dtype(times):
+        # Already minutes, e.g. a column read back from a columnar table
+        return pd.Series(times).fillna(NULL).to_numpy(dtype=np.int16)
+    parsed = pd.to_datetime(pd.Series(times, dtype='object'), format='%H:%M', errors='coerce')
+    minutes = parsed.dt.hour * 60 + parsed.dt.minute
+    return minutes.fillna(NULL).to_numpy(dtype=np.int16)
+
+def decode_minutes(minutes):
+    """Decodes int16 minutes back into HH:MM strings (None for NULL)."""
+    labels = np.append(MINUTE_LABELS, None)
+    return labels[np.where(np.asarray(minutes) == NULL, 1440, minutes)]
+
+def nullable(values):
+    """Wraps an array that uses the NULL sentinel as a pandas nullable integer array."""
+    return pd.arrays.IntegerArray(values, values == NULL)
+
+def decode_time_columns(df):
+    """Returns a copy of `df` with any minute-coded time columns turned back into HH:MM strings."""
+    df = df.copy()
+    for name in TIME_COLUMNS:
+        if name in df.columns and pd.api.types.is_integer_dtype(df[name]):
+            df[name] = decode_minutes(df[name].fillna(NULL).to_numpy())
+    return df
+
+def is_text(column):
+    """True for a column of text, whether pandas holds it as object or as its string dtype."""
+    return pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column)
+
+def apply_schema(df):
+    """
+    Returns a copy of `df` with every known column converted to the shared
+    schema. Values that cannot be converted (a train number that is not a
+    number, a time that is not HH:MM) become missing. Unknown columns are
+    left as they are.
+    """
+    df = df.copy()
+    for name in df.columns:
+        column = df[name]
+        if name in TIME_COLUMNS:
+            if not pd.api.types.is_integer_dtype(column):
+                column = column.astype('object').where(column.isna(), column.astype('str').str.strip())
+            df[name] = nullable(encode_minutes(column))
+        elif name in INT_COLUMNS:
+            values = pd.to_numeric(column, errors='coerce')
+            df[name] = nullable(values.fillna(NULL).to_numpy(dtype=INT_COLUMNS[name]))
+        elif name in CATEGORY_COLUMNS and not isinstance(column.dtype, pd.CategoricalDtype):
+            df[name] = column.astype('category')
+    return df
+
+def to_text(df):
+    """Returns a copy of a typed frame with times as HH:MM strings and categories as plain values, ready for CSV."""
+    df = decode_time_columns(df)
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype('object')
+    return df
+
+def to_records(df):
+    """Converts a typed frame into JSON-ready records: plain ints and strings, None where missing."""
+    df = to_text(df).astype('object')
+    return df.where(pd.notnull(df), None).to_dict(orient='records')
@@ -0,0 +1,109 @@
+import csv
+import pandas as pd
+
+import clean
+import clean1
+from schema import apply_schema, is_text, to_text
+
+PLACEHOLDERS = ['--', '-', 'RT', 'Y', 'X']
+OUTPUT_COLUMNS = ['Train_No', 'Train_Name', 'From_Station', 'To_Station', 'Scheduled_Arrival', 'Scheduled_Departure']
+
+# The two scraped layouts: the station-to-station matrix read by clean.py and
+# the row-spanning file read by clean1.py
+LAYOUTS = {
+    "matrix": {
+        "headers": clean.RAW_HEADERS,
+        "read_options": {"skiprows": 1},
+        "renames": {},
+        "drop_empty_stations": False,
+        "drop_missing_train_no": False,
+    },
+    "row_spanning": {
+        "headers": clean1.RAW_HEADERS,
+        "read_options": {"header": 0},
+        "renames": {
+            'from_station': 'From_Station',
+            'to_station': 'To_Station',
+            'scheduled_arrival': 'Scheduled_Arrival',
+            'scheduled_departure': 'Scheduled_Departure'
+        },
+        "drop_empty_stations": True,
+        "drop_missing_train_no": True,
+    },
+}
+
+def detect_layout(input_filepath):
+    """
+    Looks at the header row of a scraped file and returns the name of its layout.
+    Row-spanning files carry the train link in the second column.
+    """
+    with open(input_filepath, 'r', newline='') as f:
+        header = next(csv.reader(f), [])
+    if len(header) > 1 and 'href' in header[1]:
+        return "row_spanning"
+    return "matrix"
+
+def clean_chunk(chunk, layout, carry):
+    """
+    Cleans one chunk of raw rows the same way the whole-file cleaners do.
+    `carry` holds the last known train number and name from earlier chunks and
+    is updated in place, so a train whose stops span a chunk boundary keeps them.
+    """
+    chunk['Train_No'] = chunk['train_no_1'].fillna(chunk['train_no_2'])
+    chunk['Train_Name'] = chunk['train_name_1'].fillna(chunk['train_name_2'])
+
+    for col in ('Train_No', 'Train_Name'):
+        filled = chunk[col].ffill()
+        if carry[col] is not None:
+            filled = filled.fillna(carry[col])
+        if filled.notna().any():
+            carry[col] = filled.iloc[-1]
+        chunk[col] = filled
+
+    df_clean = chunk.rename(columns=layout["renames"])[OUTPUT_COLUMNS]
+
+    for col in OUTPUT_COLUMNS:
+        df_clean[col] = df_clean[col].replace(PLACEHOLDERS, pd.NA)
+        if is_text(df_clean[col]):
+            df_clean[col] = df_clean[col].str.strip()
+
+    if layout["drop_empty_stations"]:
+        df_clean = df_clean.dropna(subset=['From_Station', 'To_Station'], how='all')
+
+    df_clean = apply_schema(df_clean)
+    if layout["drop_missing_train_no"]:
+        df_clean = df_clean.dropna(subset=['Train_No'])
+    return df_clean
+
+def clean_scraped_data(input_filepath, output_filepath, layout_name=None, chunksize=100_000):
+    """
+    Cleans a scraped train CSV of either layout in bounded chunks, so memory
+    stays flat however large the file is. The output matches clean_raw_data
+    (matrix layout) or clean_new_data (row-spanning layout).
+    """
+    print(f"Starting streaming data cleaning for '{input_filepath}'...")
+    try:
+        layout_name = layout_name or detect_layout(input_filepath)
+    except FileNotFoundError:
+        print(f"Error: The file '{input_filepath}' was not found.")
+        return
+    layout = LAYOUTS[layout_name]
+    print(f"  - Detected '{layout_name}' layout.")
+
+    reader = pd.read_csv(input_filepath, names=layout["headers"], on_bad_lines='skip',
+                         chunksize=chunksize, **layout["read_options"])
+    carry = {'Train_No': None, 'Train_Name': None}
+    rows_written = 0
+    with open(output_filepath, 'w', newline='') as out:
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(out, index=False)
+        for chunk in reader:
+            df_clean = clean_chunk(chunk, layout, carry)
+            to_text(df_clean).to_csv(out, index=False, header=False)
+            rows_written += len(df_clean)
+
+    print(f"Cleaning complete. {rows_written} rows saved to '{output_filepath}'.")
+
+if __name__ == '__main__':
+    raw_file = 'etrain.csv'
+    cleaned_file = 'etrain_cleaned.csv'
+    clean_scraped_data(raw_file, cleaned_file)
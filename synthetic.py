@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+import numpy as np
+import pandas as pd
+
+import clean1
+from prority import PriorityClassifier
+
+# Words used to build realistic train names; the classifier in prority.py
+# keys off several of them.
+NAME_SUFFIXES = ['EXP', 'EXPRESS', 'SF EXP', 'MAIL', 'PASSENGER', 'SPL', 'MEMU']
+PREMIUM_NAMES = ['RAJDHANI', 'SHATABDI', 'DURONTO', 'VANDE BHARAT', 'TEJAS']
+# Train numbers are integers in the shared schema, so a leading zero would be
+# lost; special trains use the '7' prefix, never '0'.
+TRAIN_NO_PREFIXES = ['11', '12', '13', '14', '15', '16', '18', '19', '20', '22', '5', '7']
+
+def random_codes(count, rng):
+    """Returns `count` random upper-case station codes of 2 to 4 letters (repeats allowed)."""
+    letters = rng.integers(ord('A'), ord('Z') + 1, (count, 4), dtype=np.uint8)
+    lengths = rng.integers(2, 5, count)
+    words = letters.view('S4').ravel().astype(str)
+    return [word[:length] for word, length in zip(words, lengths)]
+
+def station_codes(count, rng):
+    """Returns `count` distinct station codes."""
+    codes = list(dict.fromkeys(random_codes(count, rng)))
+    while len(codes) < count:
+        codes = list(dict.fromkeys(codes + random_codes(count - len(codes), rng)))
+    return codes
+
+def generate_network(n_stations, rng, section_name="Synthetic corridor"):
+    """Builds a linear network model with `n_stations` stations 5 to 40 km apart."""
+    codes = station_codes(n_stations, rng)
+    km = np.concatenate([[0], np.cumsum(rng.integers(5, 41, n_stations - 1))])
+    stations = [{"id": code, "name": f"{code} Junction", "km_from_start": int(k)} for code, k in zip(codes, km)]
+    segments = [
+        {"id": f"SEG_{a}_{b}", "from": a, "to": b, "distance_km": int(kb - ka), "type": "double"}
+        for a, b, ka, kb in zip(codes, codes[1:], km, km[1:])
+    ]
+    return {"section_name": section_name, "stations": stations, "segments": segments}
+
+def generate_timetable(n_trains, network, rng):
+    """
+    Generates `n_trains` trains running the whole corridor in either direction.
+    Returns a DataFrame with one row per train: number, name, direction,
+    departure minute at the origin and arrival minute at the destination.
+    """
+    stations = network['stations']
+    total_km = stations[-1]['km_from_start'] - stations[0]['km_from_start']
+
+    # Numbers are a real-looking prefix plus a running counter, widened past
+    # five digits only when there are too many trains for the prefix
+    prefixes = rng.choice(TRAIN_NO_PREFIXES, n_trains)
+    counters = dict.fromkeys(TRAIN_NO_PREFIXES, 1)
+    train_nos = []
+    for prefix in prefixes:
+        width = max(5 - len(prefix), len(str(n_trains)))
+        train_nos.append(int(f"{prefix}{counters[prefix]:0{width}d}"))
+        counters[prefix] += 1
+
+    # Trains are named after the far ends of their journeys, outside the corridor
+    ends = random_codes(2 * n_trains, rng)
+    kinds = np.where(rng.random(n_trains) < 0.05, rng.choice(PREMIUM_NAMES, n_trains), rng.choice(NAME_SUFFIXES, n_trains))
+    names = [f"{ends[2 * i]} {ends[2 * i + 1]} {kinds[i]}" for i in range(n_trains)]
+
+    # Average speeds between 40 and 110 km/h, never faster than 15 minutes
+    speed = rng.uniform(40, 110, n_trains)
+    travel = np.maximum(np.rint(total_km / speed * 60), 15).astype(int)
+    departure = rng.integers(0, 1440, n_trains)
+    return pd.DataFrame({
+        "Train_No": train_nos,
+        "Train_Name": names,
+        "direction": np.where(rng.random(n_trains) < 0.5, "DOWN", "UP"),
+        "departure": departure,
+        "arrival": (departure + travel) % 1440,
+        "origin_end": [ends[2 * i] for i in range(n_trains)],
+        "destination_end": [ends[2 * i + 1] for i in range(n_trains)],
+    })
+
+def _label(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def station_rows(timetable, network, station_id):
+    """
+    Returns the stops of every train at `station_id` as (train, from, to,
+    arrival, departure) tuples. Only the two end stations of the corridor
+    carry times; trains pass intermediate stations without a listed stop.
+    """
+    first, last = network['stations'][0]['id'], network['stations'][-1]['id']
+    if station_id not in (first, last):
+        return []
+    rows = []
+    for train in timetable.itertuples(index=False):
+        origin = first if train.direction == "DOWN" else last
+        destination = last if train.direction == "DOWN" else first
+        if station_id == origin:
+            # Arrives from outside the corridor, then departs along it
+            arrival = (int(train.departure) - 5) % 1440
+            rows.append((train, train.origin_end, station_id, _label(arrival), '--'))
+            rows.append((train, station_id, destination, '--', _label(int(train.departure))))
+        else:
+            rows.append((train, origin, station_id, _label(int(train.arrival)), '--'))
+    return rows
+
+def write_scraped_csv(timetable, network, station_id, output_filepath):
+    """
+    Writes the trains at one station in the row-spanning scraped layout read by
+    clean1.clean_new_data: the train columns are only filled on a train's first row.
+    """
+    with open(output_filepath, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(clean1.RAW_HEADERS)
+        previous = None
+        for train, from_station, to_station, arrival, departure in station_rows(timetable, network, station_id):
+            row = [''] * len(clean1.RAW_HEADERS)
+            if train.Train_No != previous:
+                row[0:3] = [train.Train_No, f"https://etrain.info/train/{train.Train_No}/schedule", train.Train_Name]
+                previous = train.Train_No
+            row[3:8] = [from_station, to_station, arrival, departure, '--']
+            row[8:13] = ['Y'] * 5
+            writer.writerow(row)
+
+def write_station_json(timetable, network, station_id, output_filepath):
+    """Writes the trains at one station in the final JSON format produced by jsonconv.py."""
+    priorities = dict(zip(timetable['Train_No'], PriorityClassifier().classify(timetable['Train_No'], timetable['Train_Name'])))
+    records = [
+        {
+            "Train_No": int(train.Train_No),
+            "Train_Name": train.Train_Name,
+            "Priority": int(priorities[train.Train_No]),
+            "From_Station": from_station,
+            "To_Station": to_station,
+            "Scheduled_Arrival": None if arrival == '--' else arrival,
+            "Scheduled_Departure": None if departure == '--' else departure,
+        }
+        for train, from_station, to_station, arrival, departure in station_rows(timetable, network, station_id)
+    ]
+    with open(output_filepath, 'w') as f:
+        json.dump(records, f)
+
+def generate_dataset(output_dir, n_trains, n_stations, seed=0):
+    """
+    Writes a complete synthetic dataset of the given size to `output_dir`:
+    network.json, plus a scraped CSV and a station JSON for both end stations.
+    No data is written for the stations in between: the section builder only
+    reads the end stations and places the intermediate stops by distance.
+    Returns a dict with the paths of everything written.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    network = generate_network(n_stations, rng)
+    timetable = generate_timetable(n_trains, network, rng)
+
+    paths = {"network": os.path.join(output_dir, 'network.json')}
+    with open(paths["network"], 'w') as f:
+        json.dump(network, f)
+    for end, station in (("first", network['stations'][0]), ("last", network['stations'][-1])):
+        paths[f"{end}_csv"] = os.path.join(output_dir, f"{station['id']}_scraped.csv")
+        paths[f"{end}_json"] = os.path.join(output_dir, f"{station['id']}_data.json")
+        write_scraped_csv(timetable, network, station['id'], paths[f"{end}_csv"])
+        write_station_json(timetable, network, station['id'], paths[f"{end}_json"])
+    return paths
+
+if __name__ == '__main__':
+    generated = generate_dataset('synthetic_data', n_trains=1000, n_stations=10, seed=42)
+    print(json.dumps(generated, indent=4))